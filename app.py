@@ -11,11 +11,34 @@
 #
 ####################################################################
 
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import flask
 import dash
 from dash import html
 import dash_bootstrap_components as dbc
+import plotly.io as pio
 
 from config import DEVENV
+from modules.engines import tune_engines, query_timings
+
+## before the query modules are imported
+tune_engines()
+
+from modules.queries import cache_stats
+
+## Dash encodes every callback response with plotly.io.json.to_json_plotly.
+## The orjson engine writes numpy arrays (trace x/y, error bars) natively
+## instead of converting them to lists for the json module.
+try:
+    import orjson
+
+    pio.json.config.default_engine = "orjson"
+
+except ImportError:
+    pio.json.config.default_engine = "json"
 
 # see dash API reference: https://dash.plotly.com/reference
 # Style selection [CERULEAN, COSMO, CYBORG, DARKLY, FLATLY, JOURNAL, LITERA, LUMEN, LUX, MATERIA, MINTY, PULSE, SANDSTONE, SIMPLEX, SKETCHY, SLATE, SOLAR, SPACELAB, SUPERHERO, UNITED, YETI, ZEPHYR]
@@ -61,6 +84,123 @@ else:
 app.title = "IAEA Nuclear Reaction Data Explorer"
 app.layout = html.Div([dash.page_container])
 
+
+## Compression of the callback responses (_dash-update-component) and of the
+## static files. Bodies shorter than COMPRESS_MIN_SIZE are sent as they are.
+## Brotli is used when the browser accepts it, gzip otherwise.
+COMPRESS_CONFIG = {
+    "COMPRESS_ALGORITHM": ["br", "gzip"],
+    "COMPRESS_MIN_SIZE": 1024,  # bytes
+    "COMPRESS_LEVEL": 6,  # gzip
+    "COMPRESS_BR_LEVEL": 5,  # brotli, 0-11
+    "COMPRESS_MIMETYPES": [
+        "application/json",
+        "application/javascript",
+        "text/javascript",
+        "text/css",
+        "text/html",
+        "text/plain",
+    ],
+}
+
+STATIC_PATHS = ("_dash-component-suites/", "assets/", "reaction_options.js")
+
+
+STATIC_COMPRESS_CACHE_ENTRIES = 256
+
+
+class StaticCompressCache:
+    ## compressed bodies of the static files, made once per file and encoding
+    ## and kept for the STATIC_COMPRESS_CACHE_ENTRIES most recent ones;
+    ## callback responses have no key and are compressed on the fly
+    def __init__(self):
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        if not key:
+            return None
+
+        with self.lock:
+            if key not in self.data:
+                return None
+
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key, value):
+        if not key:
+            return
+
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+
+            while len(self.data) > STATIC_COMPRESS_CACHE_ENTRIES:
+                self.data.popitem(last=False)
+
+
+def static_compress_key(request):
+    path = request.path[len(app.config.routes_pathname_prefix) :]
+
+    if path.startswith(STATIC_PATHS):
+        ## the algorithm that will be used, not the raw Accept-Encoding header:
+        ## the best by quality, the first of COMPRESS_ALGORITHM on a tie;
+        ## m is the modification time Dash appends to the asset urls
+        algorithm = request.accept_encodings.best_match(
+            COMPRESS_CONFIG["COMPRESS_ALGORITHM"]
+        )
+        return f"{request.path}:{request.args.get('m', '')}:{algorithm}"
+
+
+try:
+    from flask_compress import Compress
+
+    app.server.config.update(COMPRESS_CONFIG)
+    app.server.config["COMPRESS_CACHE_BACKEND"] = StaticCompressCache
+    app.server.config["COMPRESS_CACHE_KEY"] = static_compress_key
+    Compress(app.server)
+
+except ImportError:
+    print("flask-compress is not installed, responses are not compressed")
+
+
+## reaction dropdown options of every incident particle, see assets/options.js.
+## A plain script that sets window.reaction_options, loaded before the Dash
+## renderer, since the clientside callbacks of Dash 2.9 cannot wait for a fetch.
+from pages_common import reaction_options
+
+REACTION_OPTIONS = "window.reaction_options = " + json.dumps(reaction_options()) + ";"
+REACTION_OPTIONS_MAX_AGE = 24 * 3600  # seconds
+
+
+@app.server.route(app.config.routes_pathname_prefix + "reaction_options.js")
+def reaction_options_js():
+    response = flask.Response(REACTION_OPTIONS, mimetype="application/javascript")
+    response.cache_control.public = True
+    response.cache_control.max_age = REACTION_OPTIONS_MAX_AGE
+    response.add_etag()
+
+    return response.make_conditional(flask.request)
+
+
+## the version in the url replaces the cached script when the options change
+app.config.external_scripts.append(
+    app.config.requests_pathname_prefix
+    + "reaction_options.js?v="
+    + hashlib.sha1(REACTION_OPTIONS.encode()).hexdigest()[:12]
+)
+
+
+## hit/miss counters of the query cache, SQL timings and pool status;
+## development server only, they are not for the public
+if DEVENV:
+
+    @app.server.route(app.config.routes_pathname_prefix + "cache_stats")
+    def query_cache_stats():
+        return {**cache_stats(), "sql": query_timings()}
+
+
 if __name__ == "__main__":
     if DEVENV:
         app.run_server(host="0.0.0.0", use_reloader=True, debug=True)
@@ -0,0 +1,74 @@
+// Clientside callbacks of the reaction figures, registered for every page by
+// clientside_figure_callbacks() in pages_common.py. They only rewrite layout
+// or trace attributes, so they run in the browser without a server round trip.
+// EXFOR traces carry their entry_id, year, e_min, e_max and points in meta.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    figs: {
+        update_axis: function (xaxis_type, yaxis_type, fig) {
+            if (!fig || !fig.layout) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+
+            const layout = Object.assign({}, fig.layout, {
+                xaxis: Object.assign({}, fig.layout.xaxis, { type: xaxis_type }),
+                yaxis: Object.assign({}, fig.layout.yaxis, { type: yaxis_type }),
+            });
+
+            return Object.assign({}, fig, { layout: layout });
+        },
+
+        filter_by_year_range: function (year_range, fig) {
+            if (!fig || !year_range) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+
+            let filter_model = {};
+
+            const data = fig.data.map(function (record) {
+                const year = record.meta ? record.meta.year : null;
+
+                if (year === null || year === undefined) {
+                    return record;
+                }
+
+                filter_model = {
+                    year: {
+                        filterType: "number",
+                        type: "lessThan",
+                        filter: year_range[1],
+                    },
+                };
+
+                const visible =
+                    year_range[0] < year && year < year_range[1] ? "true" : "legendonly";
+
+                return Object.assign({}, record, { visible: visible });
+            });
+
+            return [Object.assign({}, fig, { data: data }), filter_model];
+        },
+
+        highlight_data: function (selected, fig) {
+            if (!fig || !selected || !selected.length) {
+                throw window.dash_clientside.PreventUpdate;
+            }
+
+            const entry_ids = new Set(selected.map((s) => s.entry_id));
+
+            const data = fig.data.map(function (record) {
+                if (!record.meta) {
+                    return record;
+                }
+
+                const marker = Object.assign({}, record.marker, {
+                    size: entry_ids.has(record.meta.entry_id) ? 15 : 8,
+                });
+
+                return Object.assign({}, record, { marker: marker });
+            });
+
+            return Object.assign({}, fig, { data: data });
+        },
+    },
+});
@@ -0,0 +1,26 @@
+// Options of the reaction dropdowns, registered for every page by
+// clientside_reaction_options_callback() in pages_common.py. The options of all
+// incident particles come in one reaction_options.js (see app.py), loaded as a
+// script before the Dash renderer and kept in the browser cache. It sets
+// window.reaction_options, so the callbacks return the options synchronously
+// and switching the particle needs no server round trip.
+
+function options_of(kind, proj) {
+    if (!proj || !window.reaction_options) {
+        throw window.dash_clientside.PreventUpdate;
+    }
+
+    return window.reaction_options[kind][proj.toUpperCase()] || [];
+}
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    options: {
+        reactions: function (proj) {
+            return options_of("reactions", proj);
+        },
+
+        exfor_reactions: function (proj) {
+            return options_of("exfor_reactions", proj);
+        },
+    },
+});
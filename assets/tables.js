@@ -0,0 +1,16 @@
+// purge_rows drops the blocks of a grid on the infinite row model, which then
+// asks get_rows() in pages_common.py for them again.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    tables: {
+        purge_rows: function (source, table_id) {
+            try {
+                dash_ag_grid.getApi(table_id).purgeInfiniteCache();
+            } catch (e) {
+                // not mounted yet, it reads the new rows on its first request
+            }
+
+            return window.dash_clientside.no_update;
+        },
+    },
+});
@@ -0,0 +1,64 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+## Facility counts of the geo map: groupby + apply over the rows of geo_df on
+## every render vs. the rollup made once with geo_df (facility_counts()).
+## Needs the EXFOR database of config.
+## run from the repository root: python -m benchmarks.bench_geo
+
+from modules.exfor.geofig import (
+    FACILITY_COLUMNS,
+    get_geo_df,
+    get_geo_rollup,
+    facility_counts,
+    select_geo_rows,
+)
+from benchmarks.bench_traces import timeit
+
+
+SELECTIONS = {
+    "all reactions": {},
+    "neutron induced": {"projectile": ["N"]},
+    "(n,g) cross sections": {"projectile": ["N"], "process": ["N,G"], "sf6": ["SIG"]},
+}
+
+
+def groupby_counts(geo_df):
+    ## counting of geo_fig() before the rollup
+    entries = geo_df.groupby(["main_facility_institute", "main_facility_type"])[
+        "entry"
+    ].unique()
+    count_df = geo_df.groupby(FACILITY_COLUMNS)["entry"].count().reset_index(
+        name="count"
+    )
+    if not count_df.empty:
+        count_df["entries"] = count_df.apply(
+            lambda x: entries[x["main_facility_institute"], x["main_facility_type"]],
+            axis=1,
+        )
+
+    return count_df
+
+
+if __name__ == "__main__":
+    geo_df = get_geo_df()
+    t_build = timeit(get_geo_rollup, repeat=1)
+    print(f"{len(geo_df)} reactions, rollup built in {t_build:.3f} s")
+
+    for name, filters in SELECTIONS.items():
+        positions = select_geo_rows(filters) if filters else None
+        rows = geo_df if positions is None else geo_df.iloc[positions]
+
+        t_groupby = timeit(groupby_counts, rows)
+        t_rollup = timeit(facility_counts, positions)
+
+        print(f"{name}: {len(rows)} rows")
+        print(f"  groupby: {t_groupby:8.3f} s")
+        print(f"  rollup : {t_rollup:8.3f} s")
+        print(f"  speedup: {t_groupby / t_rollup:8.1f} x")
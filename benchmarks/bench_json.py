@@ -0,0 +1,50 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+## Encoding of callback responses: json vs. orjson engine of plotly.io.json,
+## which is what Dash calls on every create_fig / get_rows output.
+## run from the repository root: python -m benchmarks.bench_json
+
+from plotly.io.json import to_json_plotly
+
+from modules.reactions.figs import default_chart, exfor_traces
+from benchmarks.bench_traces import synthetic_frame, timeit
+
+
+CASES = [(50, 200), (200, 400), (500, 400)]
+TABLE_ROWS = 200
+
+
+def create_fig_outputs(entries, points):
+    ## figure and one data table block, as returned by create_fig / get_rows
+    df, legends = synthetic_frame(entries, points)
+
+    fig = default_chart("log", "log", "n,p")
+    fig.add_traces(exfor_traces(df, legends, x="en_inc", dx="den_inc"))
+    rows = {"rowData": df.iloc[:TABLE_ROWS].to_dict("records"), "rowCount": len(df)}
+
+    return fig, rows
+
+
+def encode(outputs, engine):
+    return [to_json_plotly(o, engine=engine) for o in outputs]
+
+
+if __name__ == "__main__":
+    for entries, points in CASES:
+        outputs = create_fig_outputs(entries, points)
+        size = sum(len(s) for s in encode(outputs, "json"))
+
+        t_json = timeit(encode, outputs, "json")
+        t_orjson = timeit(encode, outputs, "orjson")
+
+        print(f"{entries} entries x {points} points, {size / 1024**2:.1f} MB")
+        print(f"  json   : {t_json:8.3f} s")
+        print(f"  orjson : {t_orjson:8.3f} s")
+        print(f"  speedup: {t_json / t_orjson:8.1f} x")
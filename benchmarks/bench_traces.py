@@ -0,0 +1,90 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+## Trace construction: per-entry boolean masks vs. one sort + slices.
+## run from the repository root: python -m benchmarks.bench_traces
+
+import time
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from modules.reactions.figs import exfor_traces
+
+
+ENTRIES = 500
+POINTS = 400
+
+
+def synthetic_frame(entries=ENTRIES, points=POINTS, seed=0):
+    rng = np.random.default_rng(seed)
+    entry_ids = np.array([f"{10000 + i:05d}-002-0" for i in range(entries)])
+    n = entries * points
+
+    df = pd.DataFrame(
+        {
+            "entry_id": rng.permutation(np.repeat(entry_ids, points)),
+            "en_inc": rng.uniform(1e-5, 20.0, n),
+            "den_inc": rng.uniform(0.0, 0.1, n),
+            "data": rng.uniform(0.0, 3.0, n),
+            "ddata": rng.uniform(0.0, 0.3, n),
+        }
+    )
+    legends = {
+        e: {"author": "A.Author", "year": 1990, "points": points} for e in entry_ids
+    }
+
+    return df, legends
+
+
+def mask_traces(df, legends):
+    ## the loop previously used in create_fig
+    traces = []
+    i = 0
+    for e in legends.keys():
+        traces.append(
+            go.Scatter(
+                x=df[df["entry_id"] == e]["en_inc"],
+                y=df[df["entry_id"] == e]["data"],
+                error_x=dict(type="data", array=df[df["entry_id"] == e]["den_inc"]),
+                error_y=dict(type="data", array=df[df["entry_id"] == e]["ddata"]),
+                showlegend=True,
+                name=e,
+                marker=dict(size=8, symbol=i),
+                mode="markers",
+            )
+        )
+        i += 1
+        if i == 30:
+            i = 1
+
+    return traces
+
+
+def timeit(func, *args, repeat=3, **kwargs):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+if __name__ == "__main__":
+    df, legends = synthetic_frame()
+    print(f"{ENTRIES} entries, {len(df)} rows")
+
+    t_mask = timeit(mask_traces, df, legends)
+    t_slice = timeit(exfor_traces, df, legends, x="en_inc", dx="den_inc")
+
+    print(f"per-entry masks : {t_mask:8.3f} s")
+    print(f"group_slices    : {t_slice:8.3f} s")
+    print(f"speedup         : {t_mask / t_slice:8.1f} x")
@@ -0,0 +1,55 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import hashlib
+from collections.abc import Iterable
+
+
+## Keys of the query cache of modules/queries.py, kept apart from it so that
+## they can be built without the databases of config.
+SCALARS = (str, bytes, int, float, bool)
+
+
+def normalize(arg):
+    ## input_store: sorted keys, unset values dropped; other values as they are
+    if isinstance(arg, dict):
+        return tuple(
+            (str(k), normalize(v))
+            for k, v in sorted(arg.items(), key=lambda kv: str(kv[0]))
+            if v is not None and v != ""
+        )
+
+    elif isinstance(arg, SCALARS) or arg is None:
+        return arg
+
+    elif isinstance(arg, Iterable):
+        return tuple(normalize(a) for a in arg)
+
+    return repr(arg)
+
+
+def normalize_args(args):
+    ## each argument keeps its position; an argument that is a collection of
+    ## ids (entry ids, reaction ids, libs_select) is sorted
+    normalized = []
+    for arg in args:
+        arg = normalize(arg)
+        if isinstance(arg, tuple) and all(
+            isinstance(a, SCALARS) or a is None for a in arg
+        ):
+            arg = tuple(sorted(arg, key=repr))
+        normalized.append(arg)
+
+    return tuple(normalized)
+
+
+def make_key(name, version, args, kwargs):
+    kwargs = {k: normalize_args([v])[0] for k, v in kwargs.items()}
+    key = (name, version, normalize_args(args), normalize(kwargs))
+    return hashlib.sha1(repr(key).encode()).hexdigest()
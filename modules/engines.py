@@ -0,0 +1,143 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import os
+import time
+import logging
+import threading
+from sqlalchemy import create_engine, event, make_url
+from sqlalchemy.orm import sessionmaker
+
+import config
+
+
+## One engine per database for the whole process. The query functions of the
+## submodules take their connections from config.engines (and the sessions
+## bound to them), so tune_engines() replaces those engines in place with the
+## ones made here, before any query module is imported.
+POOL_SIZE = 8  # per worker process, >= QUERY_THREADS of modules/queries.py
+POOL_MAX_OVERFLOW = 4
+POOL_TIMEOUT = 30  # seconds
+COMPILED_CACHE_SIZE = 1200  # SQL compiled from Core/ORM statements
+SQLITE_STATEMENT_CACHE = 256  # prepared statements per sqlite connection
+
+## the databases are only read by the app
+SQLITE_PRAGMAS = {
+    "query_only": "ON",
+    "mmap_size": 1024**3,
+    "cache_size": -64 * 1024,  # KiB
+    "temp_store": "MEMORY",
+}
+
+SLOW_QUERY_SECONDS = 0.5
+
+logger = logging.getLogger(__name__)
+
+_timings = {}
+_timings_lock = threading.Lock()
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
+
+def before_execute(conn, cursor, statement, parameters, context, executemany):
+    ## on the execution context, which goes away with a failed statement too
+    if context is not None:
+        context.query_start = time.perf_counter()
+
+
+def after_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "query_start", None)
+    if start is None:
+        return
+
+    elapsed = time.perf_counter() - start
+    database = conn.engine.url.database or str(conn.engine.url)
+    name = os.path.basename(database)
+
+    with _timings_lock:
+        t = _timings.setdefault(name, {"queries": 0, "seconds": 0.0, "slow": 0})
+        t["queries"] += 1
+        t["seconds"] += elapsed
+
+        if elapsed > SLOW_QUERY_SECONDS:
+            t["slow"] += 1
+
+    if elapsed > SLOW_QUERY_SECONDS:
+        statement = " ".join(statement.split())
+        logger.warning("Slow query on %s (%.2f s): %s", name, elapsed, statement)
+
+
+def make_engine(url):
+    url = make_url(url)
+    sqlite = url.get_backend_name() == "sqlite"
+
+    engine = create_engine(
+        url,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        query_cache_size=COMPILED_CACHE_SIZE,
+        connect_args=(
+            {
+                "check_same_thread": False,
+                "cached_statements": SQLITE_STATEMENT_CACHE,
+            }
+            if sqlite
+            else {}
+        ),
+    )
+
+    if sqlite:
+        event.listen(engine, "connect", set_sqlite_pragmas)
+
+    event.listen(engine, "before_cursor_execute", before_execute)
+    event.listen(engine, "after_cursor_execute", after_execute)
+
+    return engine
+
+
+def dispose_in_child():
+    ## a forked process (background callbacks) opens its own connections
+    for engine in config.engines.values():
+        engine.dispose(close=False)
+
+
+def tune_engines():
+    ## swap config.engines for the engines of make_engine(), and rebind the
+    ## sessionmakers of config that were bound to the old ones
+    old = dict(config.engines)
+
+    for name, engine in old.items():
+        config.engines[name] = make_engine(engine.url)
+
+    for value in vars(config).values():
+        if isinstance(value, sessionmaker):
+            bind = value.kw.get("bind")
+            for name, engine in old.items():
+                if bind is engine:
+                    value.configure(bind=config.engines[name])
+
+    for engine in old.values():
+        engine.dispose()
+
+    os.register_at_fork(after_in_child=dispose_in_child)
+
+
+def query_timings():
+    with _timings_lock:
+        timings = {name: dict(t) for name, t in _timings.items()}
+
+    pools = {name: engine.pool.status() for name, engine in config.engines.items()}
+
+    return {"databases": timings, "pools": pools}
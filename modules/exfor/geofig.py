@@ -7,10 +7,20 @@
 #
 ####################################################################
 
+import hashlib
 import pandas as pd
 import numpy as np
 import plotly.express as px
-from modules.exfor.list import dict3_to_country, get_facility_type, institute_df
+from modules.exfor.list import (
+    dict3_to_country,
+    get_facility_type,
+    institute_df,
+    get_dataset,
+    get_reactions_df,
+    snapshot_or,
+)
+from modules.exfor.snapshot import object_columns
+from modules.queries import put_shared, get_shared
 
 
 def get_reactions_geo(df):
@@ -36,29 +46,199 @@ def get_reactions_geo(df):
     return df
 
 
-def geo_fig(grouping, geo_df):
-    # reactions_df = get_exfor_bib_table()
-    # get entries per facility/type
-    entries = geo_df.groupby(["main_facility_institute", "main_facility_type"])[
-        "entry"
-    ].unique()
-
-    count_df = pd.DataFrame(
-        {
-            "count": geo_df.groupby(
-                [
-                    "name",
-                    "main_facility_institute",
-                    "main_facility_type",
-                    "main_facility_type_desc",
-                    "main_facility_country",
-                    "lat",
-                    "lng",
-                    # "entries",
-                ]
-            )["entry"].count()
+def get_geo_df():
+    ## shared by the geo page and the stat page, built on first use
+    return get_dataset(
+        "geo",
+        lambda: snapshot_or("geo", lambda: get_reactions_geo(get_reactions_df())),
+    )
+
+
+## Inverted index of geo_df: for each categorical column used by the geo
+## search, the sorted row positions of every value. A filter on one column is
+## a lookup, several filters are the intersection of the position arrays.
+GEO_INDEX_COLUMNS = ["sf6", "projectile", "process", "target", "main_facility_type"]
+
+
+def build_geo_index(geo_df):
+    columns = {col: geo_df[col] for col in GEO_INDEX_COLUMNS}
+    ## e.g. 26-FE-56 -> FE
+    columns["element"] = geo_df["target"].str.split("-").str[1]
+
+    index = {}
+    for col, series in columns.items():
+        codes, uniques = pd.factorize(series)
+        order = np.argsort(codes, kind="stable")
+        ## missing values have code -1, sorted before the first bound
+        bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+        index[col] = {
+            u: order[bounds[i] : bounds[i + 1]] for i, u in enumerate(uniques)
         }
-    ).reset_index()
+
+    return index
+
+
+def get_geo_index():
+    return get_dataset("geo_index", lambda: build_geo_index(get_geo_df()))
+
+
+def select_geo_rows(filters):
+    ## sorted positions of the geo_df rows matching every {column: values}
+    ## filter, any of the values of a column; None if there is no filter
+    index = get_geo_index()
+    selections = []
+
+    for col, values in filters.items():
+        parts = [index[col][v] for v in values if v in index[col]]
+
+        if not parts:
+            selections.append(np.array([], dtype=np.intp))
+        elif len(parts) == 1:
+            selections.append(parts[0])
+        else:
+            selections.append(np.unique(np.concatenate(parts)))
+
+    if not selections:
+        return None
+
+    ## smallest first, the intersections only get smaller
+    selections.sort(key=len)
+    positions = selections[0]
+    for rows in selections[1:]:
+        positions = np.intersect1d(positions, rows, assume_unique=True)
+
+    return positions
+
+
+## The rows selected by the geo search stay on the server. The browser only
+## holds the selection id, derived from the positions, so identical searches
+## share one entry.
+GEO_SELECTION_EXPIRE = 24 * 3600  # seconds
+
+
+def save_geo_selection(positions):
+    geo_df = get_geo_df()
+    if positions is None or len(positions) == len(geo_df):
+        ## all rows
+        return None
+
+    positions = np.asarray(positions, dtype=np.int64)
+    sha = hashlib.sha1(positions.tobytes())
+    sha.update(str(len(geo_df)).encode())
+    selection_id = sha.hexdigest()[:20]
+
+    put_shared("geo_selection:" + selection_id, positions, GEO_SELECTION_EXPIRE)
+
+    return selection_id
+
+
+def load_geo_positions(selection_id):
+    ## the selected positions of geo_df, None for all rows;
+    ## KeyError when the selection has expired
+    if not selection_id:
+        return None
+
+    positions = get_shared("geo_selection:" + selection_id)
+    if positions is None:
+        raise KeyError(f"Geo selection {selection_id} has expired")
+
+    return positions
+
+
+def load_geo_selection(selection_id):
+    ## the selected rows of geo_df, or all of them; KeyError as above
+    geo_df = get_geo_df()
+    positions = load_geo_positions(selection_id)
+
+    return geo_df if positions is None else geo_df.iloc[positions]
+
+
+## Facility rollup of geo_df, made once with geo_df: the facility and entry
+## code of each row, and the facilities with their number of reactions and
+## entries over the whole table, which every render without a selection
+## (the first map, a change of grouping) uses as it is. A selection of rows
+## is counted from the codes of its rows, without grouping the rows again.
+FACILITY_COLUMNS = [
+    "name",
+    "main_facility_institute",
+    "main_facility_type",
+    "main_facility_type_desc",
+    "main_facility_country",
+    "lat",
+    "lng",
+]
+
+
+def count_entries(facility, entry, n_facilities, entry_values):
+    ## number of rows and distinct entries per facility code
+    counts = np.bincount(facility, minlength=n_facilities)
+
+    n_entries = len(entry_values)
+    pairs = np.unique(facility.astype(np.int64) * n_entries + entry)
+    pair_facility, pair_entry = np.divmod(pairs, n_entries)
+    bounds = np.searchsorted(pair_facility, np.arange(n_facilities + 1))
+
+    entries = [
+        entry_values[pair_entry[bounds[i] : bounds[i + 1]]]
+        for i in range(n_facilities)
+    ]
+
+    return counts, entries
+
+
+def build_geo_rollup(geo_df):
+    ## rows without facility or entry are not on the map (groupby drops them)
+    groups = geo_df.groupby(FACILITY_COLUMNS, sort=False)
+    facilities = object_columns(groups.size().reset_index()[FACILITY_COLUMNS])
+    row_facility = groups.ngroup().fillna(-1).to_numpy().astype(np.intp)
+    row_entry, entry_values = pd.factorize(geo_df["entry"])
+    entry_values = np.asarray(entry_values, dtype=object)
+
+    located = (row_facility >= 0) & (row_entry >= 0)
+    counts, entries = count_entries(
+        row_facility[located], row_entry[located], len(facilities), entry_values
+    )
+    totals = facilities.assign(count=counts, entries=entries)
+
+    return {
+        "facilities": facilities,
+        "totals": totals[totals["count"] > 0].reset_index(drop=True),
+        "row_facility": row_facility,
+        "row_entry": row_entry,
+        "entry_values": entry_values,
+    }
+
+
+def get_geo_rollup():
+    return get_dataset("geo_rollup", lambda: build_geo_rollup(get_geo_df()))
+
+
+def facility_counts(positions=None):
+    ## one row per facility on the map: FACILITY_COLUMNS, count and entries,
+    ## of the whole table or of the rows at positions
+    rollup = get_geo_rollup()
+    if positions is None:
+        return rollup["totals"]
+
+    facilities = rollup["facilities"]
+    facility = rollup["row_facility"][positions]
+    entry = rollup["row_entry"][positions]
+    located = (facility >= 0) & (entry >= 0)
+    counts, entries = count_entries(
+        facility[located],
+        entry[located],
+        len(facilities),
+        rollup["entry_values"],
+    )
+
+    count_df = facilities.assign(count=counts, entries=entries)
+
+    return count_df[count_df["count"] > 0].reset_index(drop=True)
+
+
+def geo_fig(grouping, positions=None):
+    count_df = facility_counts(positions)
 
     if count_df.empty:
         count_df = pd.DataFrame.from_dict(
@@ -89,12 +269,6 @@ def geo_fig(grouping, geo_df):
         )
 
     else:
-        # merge list of entries to count_df
-        count_df["entries"] = count_df.apply(
-            lambda x: entries[x["main_facility_institute"], x["main_facility_type"]],
-            axis=1,
-        )
-
         # sort count_df by country name alphabet
         count_df = count_df.sort_values(by=["main_facility_country"])
 
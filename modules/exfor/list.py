@@ -9,25 +9,82 @@
 
 import json
 import os
+import threading
 import pandas as pd
-import requests
+from types import MappingProxyType
 
 from exfor_dictionary.exfor_dictionary import Diction
-from config import EXFOR_DICTIONARY, MASTER_GIT_REPO_PATH, MASTER_GIT_REPO_URL, HEADERS
+from config import EXFOR_DICTIONARY, MASTER_GIT_REPO_PATH
 
 from submodules.exfor.queries import (
     get_exfor_bib_table,
     join_reaction_bib,
     join_index_bib,
 )
+from modules.exfor.snapshot import (
+    load_snapshot,
+    load_dictionaries,
+    string_columns,
+)
+
+
+## EXFOR tables are built the first time a page asks for them, not at import.
+## Workers that only serve /reactions/* never pay for the joins below.
+## A dataset is kept for the life of the worker: a new snapshot (a new
+## entry_updatedate.dat) is only picked up by workers started after it.
+_datasets = {}
+_dataset_locks = {}
+_dataset_locks_guard = threading.Lock()
+
+
+def get_dataset(name, builder):
+    ## Build the dataset once per process, other threads wait for the first build
+    if name in _datasets:
+        return _datasets[name]
+
+    with _dataset_locks_guard:
+        lock = _dataset_locks.setdefault(name, threading.Lock())
+
+    with lock:
+        if name not in _datasets:
+            _datasets[name] = builder()
+
+    return _datasets[name]
+
+
+def snapshot_or(name, builder):
+    ## prefer the memory-mapped snapshot, fall back to SQL if it is outdated;
+    ## str columns are string[pyarrow] either way
+    df = load_snapshot(name)
+    return df if df is not None else string_columns(builder())
+
+
+def get_bib_df():
+    return get_dataset("bib", lambda: snapshot_or("bib", get_exfor_bib_table))
+
+
+def get_reactions_df():
+    return get_dataset(
+        "reactions", lambda: snapshot_or("reactions", join_reaction_bib)
+    )
+
+
+def get_index_df():
+    # which is heavy
+    return get_dataset("index", lambda: snapshot_or("index", join_index_bib))
+
+
+def get_entry_numbers():
+    ## tuple so that it can be passed to str.startswith directly
+    return get_dataset("entries", lambda: tuple(get_bib_df()["entry"].to_list()))
 
 
-bib_df = get_exfor_bib_table()
-reactions_df = join_reaction_bib()
-index_df = join_index_bib()  # which is heavy
+def number_of_entries():
+    return len(get_bib_df())
 
-number_of_entries = len(bib_df)
-number_of_reactions = len(reactions_df)
+
+def number_of_reactions():
+    return len(get_reactions_df())
 
 
 MAPPING = {
@@ -294,16 +351,19 @@ MAPPING = {
 
 
 
-def get_latest_master_release():
-    response = requests.get(f"{MASTER_GIT_REPO_URL.replace('github.com','api.github.com/repos')}releases/latest", verify=False, headers=HEADERS)
-    return response.json()["name"]
+ENTRY_UPDATEDATE = os.path.join(MASTER_GIT_REPO_PATH, "entry_updatedate.dat")
+
 
+def updated_entries_version():
+    ## changes whenever the master repository is pulled
+    try:
+        return os.stat(ENTRY_UPDATEDATE).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
 
 def get_updated_entries():
-    with open(
-        os.path.join(MASTER_GIT_REPO_PATH, "entry_updatedate.dat")
-    ) as ent_up_file:
+    with open(ENTRY_UPDATEDATE) as ent_up_file:
         """
         read https://github.com/IAEA-NDS/exfor_master/blob/main/entry_updatedate.dat
         return df as follows
@@ -325,9 +385,6 @@ def get_updated_entries():
     return ent_update_df
 
 
-ent_update_df = get_updated_entries()
-
-
 def get_institute_df():
     institute_df = pd.read_pickle(
         os.path.join(EXFOR_DICTIONARY, "pickles/institute.pickle")
@@ -338,62 +395,85 @@ def get_institute_df():
 institute_df = get_institute_df()
 
 
+## EXFOR dictionaries used by the pages, parsed once per process and shared
+## read-only. The snapshot build also writes them to a json file, which is
+## read instead of the dictionary package while both the snapshot and the
+## installed exfor_dictionary are the ones it was built with.
+DICTIONARIES = {
+    "3": "institutes",
+    "18": "facility_types",
+    "31": "sf5",
+    "33": "sf7",
+    "34": "sf8",
+}
+
+
+def freeze(diction):
+    return MappingProxyType(
+        {
+            code: MappingProxyType(dict(item)) if isinstance(item, dict) else item
+            for code, item in diction.items()
+        }
+    )
+
+
+def parse_diction(diction_num):
+    return Diction(diction_num=diction_num).get_diction()
+
+
+def get_diction(diction_num):
+    def build():
+        diction = load_dictionaries().get(diction_num)
+        return freeze(diction if diction is not None else parse_diction(diction_num))
+
+    return get_dataset("diction_" + diction_num, build)
+
+
 def dict3_to_country():
-    D = Diction(diction_num="3")
-    institutes = D.get_diction()
-    country_dict = {}
+    def build():
+        institutes = get_diction("3")
+        country_dict = {}
 
-    for i in institutes:
-        country_cd = i[1:4].strip()
-        insttitute = i[4:].strip()
+        for i in institutes:
+            country_cd = i[1:4].strip()
+            insttitute = i[4:].strip()
 
-        if country_cd == insttitute and i != "3CHPCHP":
-            country_dict[i[0:4]] = institutes[i]["description"]
+            if country_cd == insttitute and i != "3CHPCHP":
+                country_dict[i[0:4]] = institutes[i]["description"]
 
-    # df = pd.DataFrame(countries, columns=["country_code", "area_code", "country"])
+        return MappingProxyType(country_dict)
 
-    return country_dict
+    return get_dataset("country_codes", build)
 
 
 def get_institutes():
-    D = Diction(diction_num="3")
-
-    return D.get_diction()
+    return get_diction("3")
 
 
 def get_facility_type():
-    D = Diction(diction_num="18")
-    facilities = D.get_diction()
-    facilities_dict = {}
-
-    for i in facilities:
-        facilities_dict[i] = facilities[i]["description"]
+    def build():
+        facilities = get_diction("18")
+        return MappingProxyType(
+            {code: facilities[code]["description"] for code in facilities}
+        )
 
-    return facilities_dict
+    return get_dataset("facility_type_desc", build)
 
 
 def get_facility_types():
-    D = Diction(diction_num="18")
-
-    return D.get_diction()
+    return get_diction("18")
 
 
 def get_sf5():
-    D = Diction(diction_num="31")
-
-    return D.get_diction()
+    return get_diction("31")
 
 
 def get_sf7():
-    D = Diction(diction_num="33")
-
-    return D.get_diction()
+    return get_diction("33")
 
 
 def get_sf8():
-    D = Diction(diction_num="34")
-
-    return D.get_diction()
+    return get_diction("34")
 
 
 # unique incident particles
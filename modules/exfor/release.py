@@ -0,0 +1,133 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import os
+import json
+import time
+import threading
+import git
+import requests
+
+from config import DATA_DIR, MASTER_GIT_REPO_PATH, MASTER_GIT_REPO_URL, HEADERS
+
+
+## Release name of the EXFOR master repository shown in the navbars.
+## It is read from a cache file or the local checkout, never from the network
+## while a page is rendered. GitHub is only asked in a background thread.
+RELEASE_CACHE_FILE = os.path.join(DATA_DIR, "exfor_master_release.json")
+RELEASE_TTL = 6 * 60 * 60  # seconds
+RELEASE_RETRY = 10 * 60  # seconds, after a failed refresh
+RELEASE_TIMEOUT = 5  # seconds
+
+_release = {"loaded": False, "name": None, "checked": 0.0}
+_release_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+def read_release_cache():
+    ## written by refresh_master_release(), e.g. from a cron job
+    if not os.path.exists(RELEASE_CACHE_FILE):
+        return None, 0.0
+
+    try:
+        with open(RELEASE_CACHE_FILE) as f:
+            cache = json.load(f)
+        return cache["name"], float(cache["updated"])
+
+    except (OSError, ValueError, KeyError):
+        return None, 0.0
+
+
+def write_release_cache(name):
+    tmp = RELEASE_CACHE_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"name": name, "updated": time.time()}, f)
+    os.replace(tmp, RELEASE_CACHE_FILE)
+
+
+def get_local_master_release():
+    ## latest tag of the local exfor_master checkout
+    try:
+        repo = git.Repo(MASTER_GIT_REPO_PATH)
+        tags = sorted(repo.tags, key=lambda t: t.commit.committed_date)
+
+    except (git.exc.GitError, ValueError, OSError):
+        return None
+
+    return tags[-1].name if tags else None
+
+
+def fetch_latest_master_release():
+    response = requests.get(
+        f"{MASTER_GIT_REPO_URL.replace('github.com','api.github.com/repos')}releases/latest",
+        headers=HEADERS,
+        timeout=RELEASE_TIMEOUT,
+    )
+    response.raise_for_status()
+    return response.json()["name"]
+
+
+def refresh_master_release():
+    try:
+        name = fetch_latest_master_release()
+
+    except (requests.RequestException, ValueError, KeyError) as e:
+        print(f"EXFOR master release refresh failed: {e}")
+        with _release_lock:
+            _release["checked"] = time.time() - RELEASE_TTL + RELEASE_RETRY
+        return None
+
+    with _release_lock:
+        _release["name"] = name
+        _release["checked"] = time.time()
+
+    try:
+        write_release_cache(name)
+    except OSError:
+        pass
+
+    return name
+
+
+def _refresh_in_background():
+    ## at most one refresh thread per process
+    if not _refresh_lock.acquire(blocking=False):
+        return
+
+    def run():
+        try:
+            refresh_master_release()
+        finally:
+            _refresh_lock.release()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_latest_master_release():
+    with _release_lock:
+        ## the cache file and the local tag are read once per process; after
+        ## that only a refresh changes the name, and a failed one its retry time
+        if not _release["loaded"]:
+            name, updated = read_release_cache()
+            if name is None:
+                name, updated = get_local_master_release(), 0.0
+            _release.update(loaded=True, name=name, checked=updated)
+
+        name = _release["name"]
+        stale = time.time() - _release["checked"] > RELEASE_TTL
+
+    if stale:
+        _refresh_in_background()
+
+    return name if name else "unknown"
+
+
+if __name__ == "__main__":
+    ## refresh job: python -m modules.exfor.release
+    print(refresh_master_release())
@@ -0,0 +1,226 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import os
+import json
+import shutil
+import hashlib
+import datetime
+import pandas as pd
+from functools import lru_cache
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from config import DATA_DIR, MASTER_GIT_REPO_PATH
+
+
+## Precomputed EXFOR tables in Arrow IPC format.
+## The files are written once by the build step below and memory-mapped by
+## every worker, so that the OS shares their pages between processes.
+## A snapshot belongs to one state of entry_updatedate.dat in the master
+## repository and is ignored as soon as that file changes.
+SNAPSHOT_DIR = os.path.join(DATA_DIR, "snapshots")
+SNAPSHOT_FORMAT = 2
+
+
+def snapshot_version():
+    file = os.path.join(MASTER_GIT_REPO_PATH, "entry_updatedate.dat")
+
+    if not os.path.exists(file):
+        return None
+
+    sha = hashlib.sha1(str(SNAPSHOT_FORMAT).encode())
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha.update(chunk)
+
+    return sha.hexdigest()[:16]
+
+
+def snapshot_path(name, version):
+    return os.path.join(SNAPSHOT_DIR, version, name + ".arrow")
+
+
+def load_snapshot(name):
+    ## Returns None when pyarrow is missing or the snapshot is absent/outdated
+    if pa is None:
+        return None
+
+    version = snapshot_version()
+    if not version:
+        return None
+
+    file = snapshot_path(name, version)
+    if not os.path.exists(file):
+        return None
+
+    source = pa.memory_map(file, "r")
+    table = pa.ipc.open_file(source).read_all()
+
+    ## numeric columns without nulls and the str columns stay backed by the
+    ## mapped file: str columns become Arrow-backed string[pyarrow] columns,
+    ## not one Python str object per row and worker
+    return table.to_pandas(split_blocks=True, types_mapper=arrow_strings)
+
+
+def arrow_strings(arrow_type):
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return pd.StringDtype("pyarrow")
+
+    return None
+
+
+def string_columns(df):
+    ## the str columns of a frame built from SQL as string[pyarrow], the dtype
+    ## load_snapshot() gives them, so that a table has the same dtypes with or
+    ## without a snapshot
+    if pa is None:
+        return df
+
+    columns = [
+        c
+        for c in df.columns
+        if df[c].dtype == object
+        and pd.api.types.infer_dtype(df[c], skipna=True) == "string"
+    ]
+
+    return df.astype({c: pd.StringDtype("pyarrow") for c in columns})
+
+
+def object_columns(df):
+    ## the string[pyarrow] columns of a snapshot frame as object columns with
+    ## None for missing values, for code that needs plain str values, such as
+    ## np.where on them or the json of rowData and figures
+    columns = [c for c in df.columns if isinstance(df[c].dtype, pd.StringDtype)]
+
+    return df.assign(
+        **{c: df[c].astype(object).where(df[c].notna(), None) for c in columns}
+    )
+
+
+def dictionary_version():
+    ## changes with any update of the installed exfor_dictionary package
+    import exfor_dictionary
+
+    package = os.path.dirname(exfor_dictionary.__file__)
+    sha = hashlib.sha1()
+    for name in sorted(os.listdir(package)):
+        if name.endswith(".json"):
+            st = os.stat(os.path.join(package, name))
+            sha.update(f"{name}:{st.st_size}:{st.st_mtime_ns}".encode())
+
+    return sha.hexdigest()[:16]
+
+
+def dictionaries_path(version):
+    return os.path.join(
+        SNAPSHOT_DIR, version, f"dictionaries-{dictionary_version()}.json"
+    )
+
+
+@lru_cache(maxsize=None)
+def read_dictionaries(file):
+    with open(file) as f:
+        return json.load(f)
+
+
+def load_dictionaries():
+    ## {diction_num: diction} of the snapshot, empty when there is none
+    ## for this state of the master repository and of exfor_dictionary
+    version = snapshot_version()
+    if not version:
+        return {}
+
+    file = dictionaries_path(version)
+    if not os.path.exists(file):
+        return {}
+
+    return read_dictionaries(file)
+
+
+def to_arrow_table(df):
+    ## str columns are written as they are, not dictionary encoded, so that
+    ## load_snapshot() can use their buffers in the mapped file directly
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def write_table(df, file):
+    table = to_arrow_table(df)
+
+    ## no compression, otherwise the file cannot be mapped as is
+    with pa.OSFile(file, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+
+
+def build_snapshot():
+    from submodules.exfor.queries import (
+        get_exfor_bib_table,
+        join_reaction_bib,
+        join_index_bib,
+    )
+    from modules.exfor.geofig import get_reactions_geo
+    from modules.exfor.list import DICTIONARIES, parse_diction
+
+    if pa is None:
+        raise ImportError("pyarrow is required to build EXFOR snapshots")
+
+    version = snapshot_version()
+    if not version:
+        raise FileNotFoundError("entry_updatedate.dat not found in MASTER_GIT_REPO_PATH")
+
+    target = os.path.join(SNAPSHOT_DIR, version)
+    tmp = target + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    reactions_df = join_reaction_bib()
+    tables = {
+        "bib": get_exfor_bib_table(),
+        "reactions": reactions_df,
+        "index": join_index_bib(),
+        "geo": get_reactions_geo(reactions_df.copy()),
+    }
+
+    manifest = {
+        "version": version,
+        "format": SNAPSHOT_FORMAT,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "rows": {},
+    }
+    for name, df in tables.items():
+        write_table(df, os.path.join(tmp, name + ".arrow"))
+        manifest["rows"][name] = len(df)
+
+    dictionaries = {num: parse_diction(num) for num in DICTIONARIES}
+    file = os.path.join(tmp, os.path.basename(dictionaries_path(version)))
+    with open(file, "w") as f:
+        json.dump(dictionaries, f)
+    manifest["dictionaries"] = {num: len(d) for num, d in dictionaries.items()}
+
+    with open(os.path.join(tmp, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+
+    ## swap in the new version, then drop the outdated ones
+    shutil.rmtree(target, ignore_errors=True)
+    os.rename(tmp, target)
+
+    for d in os.listdir(SNAPSHOT_DIR):
+        if d != version:
+            shutil.rmtree(os.path.join(SNAPSHOT_DIR, d), ignore_errors=True)
+
+    return manifest
+
+
+if __name__ == "__main__":
+    ## build step: python -m modules.exfor.snapshot
+    print(json.dumps(build_snapshot(), indent=1))
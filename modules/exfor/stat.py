@@ -7,6 +7,8 @@
 #
 ####################################################################
 
+import time
+import threading
 import numpy as np
 import plotly.express as px
 import pandas as pd
@@ -16,17 +18,98 @@ from dash import html, dcc
 from datetime import date, timedelta
 
 
-from modules.exfor.geofig import get_reactions_geo
 from modules.exfor.aggrid import aggrid_updated
-from modules.exfor.list import ent_update_df, bib_df, reactions_df
+from modules.exfor.list import (
+    get_bib_df,
+    get_updated_entries,
+    updated_entries_version,
+)
 from pages_common import URL_PATH, exfor_navbar, footer
 from submodules.exfor.queries import entry_query_by_id
 
-geo_df = get_reactions_geo(reactions_df)
+
+## Dashboard components are built on first use and then reused. Once one is
+## older than its ttl, or its version() has changed, the current one is still
+## served while a thread builds the next. A failed rebuild is tried again
+## after REFRESH_RETRY, not on every request.
+UPDATED_LIST_TTL = 3600  # seconds
+YEAR_FIG_TTL = 24 * 3600
+REFRESH_RETRY = 10 * 60  # seconds between two attempts to rebuild a component
+
+_components = {}
+_components_lock = threading.Lock()
+
+
+def refresh_component(component, build, version):
+    try:
+        value = build()
+    except Exception as e:
+        print(f"Rebuilding a stat component failed, keeping the old one: {e}")
+        return
+
+    component.update(value=value, built=time.monotonic(), version=version)
+
+
+def refresh_in_background(component, build, version):
+    try:
+        refresh_component(component, build, version)
+    finally:
+        component["lock"].release()
+
+
+def cached_component(name, build, ttl, version=lambda: None):
+    current = version()
+
+    with _components_lock:
+        component = _components.setdefault(
+            name,
+            {
+                "value": None,
+                "built": 0.0,
+                "attempted": float("-inf"),
+                "version": None,
+                "lock": threading.Lock(),
+            },
+        )
+
+    if component["value"] is None:
+        ## first use, the caller waits for it
+        with component["lock"]:
+            if component["value"] is None:
+                component.update(
+                    value=build(), built=time.monotonic(), version=current
+                )
+
+        return component["value"]
+
+    now = time.monotonic()
+    stale = now - component["built"] > ttl or component["version"] != current
+    retry = now - component["attempted"] > REFRESH_RETRY
+
+    if stale and retry and component["lock"].acquire(blocking=False):
+        component["attempted"] = now
+        threading.Thread(
+            target=refresh_in_background,
+            args=(component, build, current),
+            daemon=True,
+        ).start()
+
+    return component["value"]
 
 
 def updated_list():
+    return cached_component(
+        "updated_list", build_updated_list, UPDATED_LIST_TTL, updated_entries_version
+    )
+
+
+def year_fig():
+    return cached_component("year_fig", build_year_fig, YEAR_FIG_TTL)
+
+
+def build_updated_list():
     ## Filter entries by the recently updated
+    ent_update_df = get_updated_entries()
     before = pd.to_datetime("today") - timedelta(days=60)
 
     df2 = ent_update_df[
@@ -42,10 +125,10 @@ def updated_list():
     return aggrid_updated(df3)
 
 
-def year_fig():
+def build_year_fig():
     count_df = pd.DataFrame(
         {
-            "count": bib_df.groupby(
+            "count": get_bib_df().groupby(
                 [
                     "year",
                     # "entries",
@@ -61,65 +144,51 @@ def year_fig():
     return fig
 
 
-stat_right_layout = [
-    exfor_navbar,
-    ## taxonomy
-    # html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    # html.Label("EXFOR Taxonomy"),
-    # dbc.Row(cyto_layout),
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Label("Recently added/updated EXFOR entries"),
-    updated_list(),
-    ## geo
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Label(
-        children=[
-            "Nuclear Reaction Experimental Facilities (Based on EXFOR FACILITY)  ",
-            html.A("GEO Search", href=URL_PATH + "exfor/geo"),
-        ]
-    ),
-    # dcc.Loading(
-    #     children=dbc.Row(
-    #         dcc.Graph(figure=geo_fig("Country", geo_df))
-    #     ),
-    #     type="circle",
-    # ),
-    ## year counts
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Label("Number of Nuclear Reaction Measurements (Based on EXFOR REFERENCE)"),
-    dcc.Loading(
-        children=dbc.Row(dcc.Graph(figure=year_fig())),
-        type="circle",
-    ),
-    ## All reaction index
-    # html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    # html.Label("Experimental Nuclear Reaction Indexes (Based on EXFOR REACTION)"),
-    # dcc.Loading(
-    #     children=dbc.Row(aggrid_layout("all")),
-    #     type="circle",
-    # ),
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    # html.Div(id="test"),
-    footer,
-]
-
-
-stat_content = [
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Label("Recently added/updated EXFOR entries"),
-    updated_list(),
-    ## geo
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Label(
-        children=[
-            "Nuclear Reaction Experimental Facilities (Based on EXFOR FACILITY)  ",
-            html.A("GEO Search", href=URL_PATH + "exfor/geo"),
-        ]
-    ),
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Label("Number of Nuclear Reaction Measurements (Based on EXFOR REFERENCE)"),
-    dcc.Loading(
-        children=dbc.Row(dcc.Graph(figure=year_fig())),
-        type="circle",
-    ),
-]
+def stat_right_layout():
+    return [
+        exfor_navbar(),
+        ## taxonomy
+        # html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        # html.Label("EXFOR Taxonomy"),
+        # dbc.Row(cyto_layout),
+        *stat_content(),
+        ## All reaction index
+        # html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        # html.Label("Experimental Nuclear Reaction Indexes (Based on EXFOR REACTION)"),
+        # dcc.Loading(
+        #     children=dbc.Row(aggrid_layout("all")),
+        #     type="circle",
+        # ),
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        # html.Div(id="test"),
+        footer,
+    ]
+
+
+def stat_content():
+    return [
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        html.Label("Recently added/updated EXFOR entries"),
+        updated_list(),
+        ## geo
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        html.Label(
+            children=[
+                "Nuclear Reaction Experimental Facilities (Based on EXFOR FACILITY)  ",
+                html.A("GEO Search", href=URL_PATH + "exfor/geo"),
+            ]
+        ),
+        # dcc.Loading(
+        #     children=dbc.Row(
+        #         dcc.Graph(figure=geo_fig("Country"))
+        #     ),
+        #     type="circle",
+        # ),
+        ## year counts
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        html.Label("Number of Nuclear Reaction Measurements (Based on EXFOR REFERENCE)"),
+        dcc.Loading(
+            children=dbc.Row(dcc.Graph(figure=year_fig())),
+            type="circle",
+        ),
+    ]
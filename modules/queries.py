@@ -0,0 +1,393 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import os
+import copy
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from collections.abc import Iterable
+import pandas as pd
+
+from modules.cache_keys import make_key
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+from config import DATA_DIR, MASTER_GIT_REPO_PATH, engines
+from submodules.exfor import queries as exfor_queries
+from submodules.reactions import queries as reactions_queries
+
+
+## Results of the EXFOR and ENDFTABLES queries, shared by all callbacks.
+## Keys are built from the normalized input_store and the selected ids, and
+## carry the data version, so that an update of either database retires
+## every entry. The memory tier is an LRU bound by size; the disk tier is
+## shared by all workers of the server when diskcache is installed.
+## Concurrent calls with the same key are coalesced: one caller runs the query,
+## the others wait for its result. Across workers, the disk tier holds a lock
+## per key while the first worker runs it.
+QUERY_CACHE_MAX_BYTES = 512 * 1024**2
+QUERY_CACHE_DIR = os.path.join(DATA_DIR, "query_cache")
+QUERY_CACHE_DISK_BYTES = 4 * 1024**3
+VERSION_CHECK_INTERVAL = 60  # seconds
+LOCK_EXPIRE = 600  # seconds, for a worker that dies holding a lock
+SHARED_STATE_DIR = os.path.join(DATA_DIR, "shared_state")
+
+## Independent queries of one callback run on a bounded thread pool
+QUERY_THREADS = 4
+
+_memory = OrderedDict()
+_memory_bytes = 0
+_memory_lock = threading.Lock()
+_stats = {}
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+_pool = {"pid": None, "executor": None}
+_pool_lock = threading.Lock()
+
+_version = {"value": None, "checked": 0.0}
+_version_lock = threading.Lock()
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+_disk = None
+_shared_disk = None
+if diskcache is not None:
+    try:
+        _disk = diskcache.Cache(QUERY_CACHE_DIR, size_limit=QUERY_CACHE_DISK_BYTES)
+        _shared_disk = diskcache.Cache(SHARED_STATE_DIR, eviction_policy="none")
+    except OSError as e:
+        print(f"Query cache on disk is disabled: {e}")
+
+
+def data_files():
+    ## files whose change means new data
+    files = [os.path.join(MASTER_GIT_REPO_PATH, "entry_updatedate.dat")]
+
+    for engine in engines.values():
+        if engine.url.database and engine.url.get_backend_name() == "sqlite":
+            files.append(engine.url.database)
+
+    return files
+
+
+def data_version():
+    ## cheap stat() based version, looked at once per VERSION_CHECK_INTERVAL
+    now = time.time()
+
+    with _version_lock:
+        if _version["value"] and now - _version["checked"] < VERSION_CHECK_INTERVAL:
+            return _version["value"]
+
+        sha = hashlib.sha1()
+        for file in data_files():
+            try:
+                st = os.stat(file)
+                sha.update(f"{file}:{st.st_mtime_ns}:{st.st_size}".encode())
+            except OSError:
+                sha.update(f"{file}:-".encode())
+
+        version = sha.hexdigest()[:16]
+
+        if version != _version["value"]:
+            clear_memory()
+
+        _version["value"] = version
+        _version["checked"] = now
+
+    return version
+
+
+def materialize(arg):
+    ## generators and dict views can only be read once
+    if isinstance(arg, (dict, str, bytes, list, tuple)) or not isinstance(
+        arg, Iterable
+    ):
+        return arg
+
+    return list(arg)
+
+
+def cache_key(name, args, kwargs):
+    return make_key(name, data_version(), args, kwargs)
+
+
+def value_size(value):
+    if isinstance(value, pd.DataFrame):
+        ## deep: the str columns (authors, titles, links) are most of a frame
+        return int(value.memory_usage(index=True, deep=True).sum())
+
+    return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def value_copy(value):
+    ## callers add columns to the frames they get
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+
+    return copy.deepcopy(value)
+
+
+def clear_memory():
+    global _memory_bytes
+
+    with _memory_lock:
+        _memory.clear()
+        _memory_bytes = 0
+
+
+def memory_get(key):
+    with _memory_lock:
+        if key not in _memory:
+            return None
+
+        _memory.move_to_end(key)
+        return _memory[key][0]
+
+
+def memory_put(key, value):
+    global _memory_bytes
+
+    size = value_size(value)
+    if size > QUERY_CACHE_MAX_BYTES:
+        return
+
+    with _memory_lock:
+        if key in _memory:
+            _memory_bytes -= _memory.pop(key)[1]
+
+        _memory[key] = (value, size)
+        _memory_bytes += size
+
+        while _memory_bytes > QUERY_CACHE_MAX_BYTES:
+            _, (_, s) = _memory.popitem(last=False)
+            _memory_bytes -= s
+
+
+def count(name, what):
+    with _memory_lock:
+        stats = _stats.setdefault(
+            name, {"hits": 0, "disk_hits": 0, "coalesced": 0, "misses": 0}
+        )
+        stats[what] += 1
+
+
+class Flight:
+    ## one running computation and the callers waiting for it
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def single_flight(name, key, load):
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[key] = Flight()
+
+    if not leader:
+        count(name, "coalesced")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+
+        return flight.value
+
+    try:
+        flight.value = load()
+
+    except Exception as e:
+        flight.error = e
+        raise
+
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+        flight.done.set()
+
+    return flight.value
+
+
+def memoize(func, name=None, copy=True, disk=True):
+    ## copy=False hands out the cached object itself, for read-only callers;
+    ## disk=False keeps the results of func in memory only.
+    name = name or func.__name__
+    disk = _disk if disk else None
+    value_out = value_copy if copy else (lambda value: value)
+
+    def cached(*args, **kwargs):
+        args = tuple(materialize(a) for a in args)
+        kwargs = {k: materialize(v) for k, v in kwargs.items()}
+        key = cache_key(name, args, kwargs)
+
+        value = memory_get(key)
+        if value is not None:
+            count(name, "hits")
+            return value_out(value)
+
+        if disk is not None:
+            value = disk.get(key)
+            if value is not None:
+                count(name, "disk_hits")
+                memory_put(key, value)
+                return value_out(value)
+
+        def load():
+            ## a flight for this key may have ended since memory_get()
+            value = memory_get(key)
+            if value is not None:
+                count(name, "hits")
+                return value
+
+            if disk is None:
+                return run(key, args, kwargs)
+
+            with diskcache.Lock(disk, "lock:" + key, expire=LOCK_EXPIRE):
+                ## another worker may have stored it while this one waited
+                value = disk.get(key)
+                if value is not None:
+                    count(name, "disk_hits")
+                    memory_put(key, value)
+                    return value
+
+                return run(key, args, kwargs)
+
+        return value_out(single_flight(name, key, load))
+
+    def run(key, args, kwargs):
+        count(name, "misses")
+        value = func(*args, **kwargs)
+
+        if value is not None:
+            memory_put(key, value)
+            if disk is not None:
+                disk.set(key, value)
+
+        return value
+
+    cached.__name__ = name
+    cached.__doc__ = func.__doc__
+    cached.__wrapped__ = func
+
+    return cached
+
+
+def prune_shared(now):
+    for key in [k for k, (_, expires) in _shared.items() if expires < now]:
+        del _shared[key]
+
+
+def put_shared(key, value, expire=None):
+    ## small server-side state shared by the workers, e.g. the geo selections.
+    ## Kept apart from the query results: it is only dropped when it expires.
+    now = time.time()
+    expires = now + expire if expire else float("inf")
+
+    with _shared_lock:
+        prune_shared(now)
+        _shared[key] = (value, expires)
+
+    if _shared_disk is not None:
+        _shared_disk.set(key, value, expire=expire)
+
+
+def get_shared(key):
+    with _shared_lock:
+        value, expires = _shared.get(key, (None, 0.0))
+
+    if value is not None and expires > time.time():
+        return value
+
+    if _shared_disk is not None:
+        return _shared_disk.get(key)
+
+    return None
+
+
+def reset_in_child():
+    ## a forked process (background callbacks) gets the flights and locks of
+    ## the parent without the threads that would finish or release them
+    global _memory, _memory_bytes, _memory_lock, _inflight, _inflight_lock
+    global _pool_lock, _version_lock, _shared_lock
+
+    _memory = OrderedDict()
+    _memory_bytes = 0
+    _memory_lock = threading.Lock()
+    _inflight = {}
+    _inflight_lock = threading.Lock()
+    _pool_lock = threading.Lock()
+    _version_lock = threading.Lock()
+    _shared_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=reset_in_child)
+
+
+def query_pool():
+    ## one pool per process: the background callbacks run in forked processes,
+    ## which do not get the threads of the parent's pool
+    with _pool_lock:
+        if _pool["pid"] != os.getpid():
+            _pool["executor"] = ThreadPoolExecutor(
+                max_workers=QUERY_THREADS, thread_name_prefix="query"
+            )
+            _pool["pid"] = os.getpid()
+
+        return _pool["executor"]
+
+
+def fetch_all(*calls):
+    ## (func, *args) calls run concurrently, results in the same order.
+    ## None for a call that is not needed.
+    pool = query_pool()
+    futures = [pool.submit(*call) if call else None for call in calls]
+
+    return [f.result() if f is not None else None for f in futures]
+
+
+def cache_stats():
+    with _memory_lock:
+        stats = {name: dict(s) for name, s in _stats.items()}
+        entries, size = len(_memory), _memory_bytes
+
+    return {
+        "version": _version["value"],
+        "memory": {
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": QUERY_CACHE_MAX_BYTES,
+        },
+        "disk": _disk.directory if _disk is not None else None,
+        "queries": stats,
+    }
+
+
+## EXFOR
+data_query = memoize(exfor_queries.data_query)
+index_query = memoize(exfor_queries.index_query)
+get_entry_bib = memoize(exfor_queries.get_entry_bib)
+
+## ENDFTABLES
+lib_query = memoize(reactions_queries.lib_query)
+lib_xs_data_query = memoize(reactions_queries.lib_xs_data_query)
+lib_residual_data_query = memoize(reactions_queries.lib_residual_data_query)
+lib_fy_data_query = memoize(reactions_queries.lib_fy_data_query)
+lib_da_data_query = memoize(reactions_queries.lib_da_data_query)
+lib_th_data_query = memoize(reactions_queries.lib_th_data_query)
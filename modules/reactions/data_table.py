@@ -301,7 +301,13 @@ columnSizeOptions = {
 }
 
 
+## Pages whose data table is served block by block by get_rows() in pages_common
+SERVER_SIDE_TABLES = ["xs", "rp", "da", "fy"]
+
+
 def data_table_ag(pageparam):
+    server_side = pageparam in SERVER_SIDE_TABLES
+
     return dag.AgGrid(
         id="exfor_table_" + pageparam,
         columnDefs=columnDefsDefault + columnDefs_xs
@@ -318,11 +324,17 @@ def data_table_ag(pageparam):
         defaultColDef=defaultColDef,
         columnSize="responsiveSizeToFit",
         # columnSizeOptions=columnSizeOptions,
+        rowModelType="infinite" if server_side else "clientSide",
         dashGridOptions={
             "rowSelection": "multiple",
             "rowMultiSelectWithClick": True,
             # "pagination": True,
             # "paginationPageSize": 100
+            **(
+                {"cacheBlockSize": 200, "maxBlocksInCache": 50}
+                if server_side
+                else {}
+            ),
         },
         className="ag-theme-balham",  ## Themes: ag-theme-alpine, ag-theme-alpine-dark, ag-theme-balham, ag-theme-balham-dark, ag-theme-material, and ag-bootstrap.
         persistence=True,
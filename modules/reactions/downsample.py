@@ -0,0 +1,100 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+import numpy as np
+import pandas as pd
+
+
+## Number of points sent to the browser for one figure.
+## Each trace gets an equal share, but never less than MIN_TRACE_POINTS,
+## so that the payload stays bounded however large the datasets are.
+MAX_FIGURE_POINTS = 30000
+MIN_TRACE_POINTS = 100
+
+
+def point_budget(n_traces, total=MAX_FIGURE_POINTS):
+    return max(MIN_TRACE_POINTS, total // max(n_traces, 1))
+
+
+def lttb(x, y, n_out):
+    ## Largest-Triangle-Three-Buckets, x must be sorted.
+    ## Keeps the first and last points and, in each bucket in between, the point
+    ## that spans the largest triangle with the previous pick and the average
+    ## of the next bucket. Returns the indices of the picked points.
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+
+        if i + 2 < len(edges):
+            next_x = x[end : edges[i + 2]].mean()
+            next_y = np.nanmean(y[end : edges[i + 2]])
+        else:
+            next_x, next_y = x[-1], y[-1]
+
+        area = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + np.argmax(np.nan_to_num(area, nan=-1.0))
+        idx[i + 1] = a
+
+    return idx
+
+
+def minmax(x, y, n_buckets):
+    ## Lowest and highest point of each bucket, plus both ends.
+    ## Peaks and dips of resonance curves survive, unlike with every Nth point.
+    n = len(x)
+    if 2 * n_buckets + 2 >= n or n_buckets < 1:
+        return np.arange(n)
+
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((y, bucket))
+
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(bucket)) + 1))
+    ends = np.concatenate((starts[1:], [n]))
+
+    return np.unique(np.concatenate(([0, n - 1], order[starts], order[ends - 1])))
+
+
+def downsample(df, x, y, n_out, method="lttb", x_range=None):
+    ## Reduce df to about n_out rows, optionally within the window x_range.
+    ## Rows are sorted by x; one point on either side of the window is kept
+    ## so that lines run to the edges of the plot.
+    if df.empty:
+        return df
+
+    df = df.sort_values(by=x, kind="stable")
+    xv = pd.to_numeric(df[x], errors="coerce").to_numpy(dtype=float)
+
+    if x_range:
+        lo = max(np.searchsorted(xv, x_range[0], side="left") - 1, 0)
+        hi = min(np.searchsorted(xv, x_range[1], side="right") + 1, len(xv))
+        df, xv = df.iloc[lo:hi], xv[lo:hi]
+
+    if not n_out or len(df) <= n_out:
+        return df
+
+    yv = pd.to_numeric(df[y], errors="coerce").to_numpy(dtype=float)
+
+    if method == "minmax":
+        idx = minmax(xv, yv, n_out // 2)
+
+    else:
+        idx = lttb(xv, yv, n_out)
+
+    return df.iloc[idx]
@@ -7,8 +7,12 @@
 #
 ####################################################################
 
+import numpy as np
 import plotly.graph_objects as go
-from dash import dcc
+from dash import dcc, Patch
+
+from modules.reactions.list import color_libs
+from modules.reactions.downsample import downsample
 
 
 def default_axis(mt):
@@ -74,3 +78,155 @@ def default_chart(xaxis_type, yaxis_type, reaction):
         fig.update_yaxes(exponentformat="power")
 
     return fig
+
+
+# ------------------------------------------------------------------------------
+# Trace construction
+# ------------------------------------------------------------------------------
+def group_slices(df, key):
+    ## One stable sort, then every group is a contiguous slice of the sorted frame.
+    ## Replaces df[df[key] == k] per key, which scans all rows for each key.
+    if df.empty:
+        return {}
+
+    df = df.sort_values(by=key, kind="stable")
+    keys = df[key].to_numpy()
+    bounds = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(keys)]))
+
+    return {keys[s]: df.iloc[s:e] for s, e in zip(starts, ends)}
+
+
+def legend_name(legends, e):
+    ## e.g. 'S.M.Sahakundu, 1979 [A0181-005-0]'
+    if legends.get(e) and legends[e].get("author") and legends[e].get("year"):
+        return f"{legends[e]['author']}, {legends[e]['year']} [{e}]"
+
+    elif legends.get(e):
+        return f"{legends[e]['author']}, 1900 [{e}]"
+
+    else:
+        return e
+
+
+def legend_name_short(legends, e):
+    ## legacy DE/FIS pages, without entry id
+    if legends[e].get("year"):
+        return f"{legends[e]['author']}, {legends[e]['year']}"
+
+    else:
+        return legends[e]["author"]
+
+
+def trace_meta(legends, e):
+    ## read by the figure callbacks instead of parsing the legend name
+    return {
+        "entry_id": e,
+        "year": legends[e].get("year"),
+        "e_min": legends[e].get("e_inc_min"),
+        "e_max": legends[e].get("e_inc_max"),
+        "points": legends[e].get("points"),
+    }
+
+
+def lib_traces(
+    lib_df, libs, libs_select, x="en_inc", y="data", max_points=None, x_range=None
+):
+    ## evaluated curves are reduced with min/max buckets to keep the resonances
+    slices = group_slices(lib_df, "reaction_id")
+    empty = lib_df.iloc[0:0]
+
+    traces = []
+    for l in libs_select:
+        dff = slices.get(int(l), empty)
+
+        if max_points or x_range:
+            dff = downsample(dff, x, y, max_points, "minmax", x_range)
+
+        line_color = color_libs(libs[l])
+
+        traces.append(
+            go.Scatter(
+                x=dff[x].astype(float),
+                y=dff[y].astype(float),
+                showlegend=True,
+                line_color=next(line_color),
+                name=str(libs[l]),
+                mode="lines",
+            )
+        )
+
+    return traces
+
+
+def exfor_traces(
+    df,
+    legends,
+    x,
+    y="data",
+    dx=None,
+    dy="ddata",
+    max_points=None,
+    x_range=None,
+    scattergl=False,
+    name=legend_name,
+):
+    slices = group_slices(df, "entry_id")
+    empty = df.iloc[0:0]
+    Scatter = go.Scattergl if scattergl else go.Scatter
+
+    traces = []
+    i = 0
+    for e in legends.keys():
+        if e == "total_points":
+            continue
+
+        df2 = slices.get(e, empty)
+
+        if max_points or x_range:
+            df2 = downsample(df2, x, y, max_points, "lttb", x_range)
+
+        traces.append(
+            Scatter(
+                x=df2[x],
+                y=df2[y],
+                error_x=dict(type="data", array=df2[dx]) if dx else None,
+                error_y=dict(type="data", array=df2[dy]) if dy else None,
+                showlegend=True,
+                name=name(legends, e),
+                meta=trace_meta(legends, e),
+                marker=dict(size=8, symbol=i),
+                mode="markers",
+            )
+        )
+        i += 1
+
+        if i == 30:
+            i = 1
+
+    return traces
+
+
+def update_trace_data(fig_traces, traces):
+    ## Patch with the points of new traces for the traces of the same name
+    ## listed in fig_traces. Styles, visibility and deleted traces are kept.
+    new = {t.name: t for t in traces}
+
+    patched = Patch()
+    for i, record in enumerate(fig_traces["traces"]):
+        t = new.get(record["name"])
+        if t is None:
+            continue
+
+        scale = record.get("scale", 1.0)
+        patched["data"][i]["x"] = t.x
+        patched["data"][i]["y"] = (
+            t.y if scale == 1.0 else [v * scale if v is not None else v for v in t.y]
+        )
+
+        for err in ("error_x", "error_y"):
+            if t[err].array is not None:
+                patched["data"][i][err]["array"] = t[err].array
+
+    return patched
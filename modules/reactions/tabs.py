@@ -152,6 +152,7 @@ def create_tabs(pageparam):
                     ),
                     # data table
                     data_table_ag(pageparam),
+                    dcc.Download(id="".join(["download_exfor_", pageparam])),
                 ],  # end of second tab children
             ),  # end of second tab
             dbc.Tab(
@@ -39,9 +39,6 @@ from modules.exfor.record import (
 )
 from modules.exfor.stat import stat_right_layout
 from modules.exfor.aggrid import aggrid_layout_dynamic
-from modules.exfor.list import bib_df
-
-entries = bib_df["entry"].to_list()
 
 dash.register_page(__name__, path="/exfor", path_template="/exfor/entry/<entry_id>")
 pageparam = "ex"
@@ -77,56 +74,57 @@ main_fig = dcc.Graph(
 
 
 ## right panel of the EXFOR page layout
-record_right_layout = [
-    exfor_navbar,
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Div(id="exfor_entry_links"),
-    html.Br(),
-    html.Div(id="exfor_entry_bib", children=show_entry_bib()),
-    html.Br(),
-    html.Div(id="exfor_entry_experimental_conditions"),
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    dbc.Row(
-        [
-            dbc.Col(
-                [
-                    html.Div(
-                        children=[
-                            dbc.Badge(
-                                "Download CSV",
-                                id="btn_csv_all",
-                                href="#",
-                                color="secondary",
-                            ),
-                            "  ",
-                            dbc.Badge(
-                                "Download CSV (selected)",
-                                id="btn_csv_selct",
-                                href="#",
-                                color="white",
-                                text_color="dark",
-                                className="border me-1",
-                            ),
-                            # dcc.Download(id="download-dataframe-csv"),
-                        ],
-                        style={"textAlign": "right", "margin-bottom": "10px"},
-                    ),
-                    # html.Div(id="data-table"),
-                    html.Div(id="data_table"),
-                ]
-            ),
-            dbc.Col(main_fig),
-        ]
-    ),
-    dcc.Store(id="entry_store"),
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    footer,
-]
+def record_right_layout():
+    return [
+        exfor_navbar(),
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        html.Div(id="exfor_entry_links"),
+        html.Br(),
+        html.Div(id="exfor_entry_bib", children=show_entry_bib()),
+        html.Br(),
+        html.Div(id="exfor_entry_experimental_conditions"),
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        html.Div(
+                            children=[
+                                dbc.Badge(
+                                    "Download CSV",
+                                    id="btn_csv_all",
+                                    href="#",
+                                    color="secondary",
+                                ),
+                                "  ",
+                                dbc.Badge(
+                                    "Download CSV (selected)",
+                                    id="btn_csv_selct",
+                                    href="#",
+                                    color="white",
+                                    text_color="dark",
+                                    className="border me-1",
+                                ),
+                                # dcc.Download(id="download-dataframe-csv"),
+                            ],
+                            style={"textAlign": "right", "margin-bottom": "10px"},
+                        ),
+                        # html.Div(id="data-table"),
+                        html.Div(id="data_table"),
+                    ]
+                ),
+                dbc.Col(main_fig),
+            ]
+        ),
+        dcc.Store(id="entry_store"),
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        footer,
+    ]
 
 
 ## EXFOR page layout
 def layout(entry_id=None):
-    right_layout = record_right_layout
+    right_layout = record_right_layout()
 
     return html.Div(
         [
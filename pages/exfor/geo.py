@@ -6,13 +6,12 @@
 # Contact:    nds.contact-point@iaea.org
 #
 ####################################################################
-import pandas as pd
+import logging
 import numpy as np
 import dash
 from dash import Dash, html, dcc, Input, Output, State, ctx, no_update, callback
 import dash_bootstrap_components as dbc
 from dash.exceptions import PreventUpdate
-import plotly.express as px
 
 from pages_common import (
     sidehead,
@@ -24,12 +23,20 @@ from pages_common import (
     input_obs_all,
     input_general,
     input_target,
-    generate_exfor_reactions,
+    clientside_reaction_options_callback,
     exfor_filter_opt,
 )
 from submodules.exfor.queries import reaction_query_by_id
-from modules.exfor.list import MAPPING, reactions_df, get_facility_type
-from modules.exfor.geofig import get_reactions_geo, geo_fig
+from modules.exfor.snapshot import object_columns
+from modules.exfor.list import MAPPING, get_dataset, get_facility_type
+from modules.exfor.geofig import (
+    get_geo_df,
+    geo_fig,
+    select_geo_rows,
+    save_geo_selection,
+    load_geo_selection,
+    load_geo_positions,
+)
 from modules.exfor.aggrid import aggrid_layout_bib, aggrid_index_result
 from submodules.utilities.util import get_number_from_string, x4style_nuclide_expression
 from submodules.utilities.reaction import (
@@ -40,7 +47,10 @@ from submodules.utilities.reaction import (
 
 dash.register_page(__name__, path="/exfor/geo", redirect_from=["/geo", "/geo/"])
 pageparam = "geo"
-geo_df = get_reactions_geo(reactions_df)
+
+logger = logging.getLogger(__name__)
+
+SELECTION_EXPIRED = "The search has expired, please search again."
 
 
 def input_ge(**query_strings):
@@ -53,7 +63,7 @@ def input_ge(**query_strings):
         html.Label("Facility type"),
         dcc.Dropdown(
             id="facility_type",
-            options=get_facility_type(),
+            options=dict(get_facility_type()),
             placeholder="Facility type e.g. Accelerator",
             persistence=True,
             multi=True,
@@ -75,38 +85,46 @@ def input_ge(**query_strings):
     ]
 
 
-geo_right_layout = [
-    exfor_navbar,
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Label("Nuclear Reaction Experimental Facilities (Based on EXFOR FACILITY)"),
-    dbc.Row(
-        [
-            dbc.Col(html.Label("Color by "), width="auto"),
-            dbc.Col(
-                dcc.RadioItems(
-                    id="grouping",
-                    options=["Country", "Facility Type"],
-                    value="Country",
-                    labelStyle={"display": "inline-block"},
+def geo_right_layout():
+    return [
+        exfor_navbar(),
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        html.Label("Nuclear Reaction Experimental Facilities (Based on EXFOR FACILITY)"),
+        dbc.Row(
+            [
+                dbc.Col(html.Label("Color by "), width="auto"),
+                dbc.Col(
+                    dcc.RadioItems(
+                        id="grouping",
+                        options=["Country", "Facility Type"],
+                        value="Country",
+                        labelStyle={"display": "inline-block"},
+                    ),
+                    width="auto",
                 ),
-                width="auto",
+            ]
+        ),
+        dcc.Loading(
+            children=dbc.Row(
+                dcc.Graph(
+                    id="geo_map",
+                    figure=get_dataset(
+                        "geo_fig_country", lambda: geo_fig("Country")
+                    ),
+                )
             ),
-        ]
-    ),
-    dcc.Loading(
-        children=dbc.Row(dcc.Graph(id="geo_map", figure=geo_fig("Country", geo_df))),
-        type="circle",
-    ),
-    dcc.Store(id="entries_store_geo"),
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    html.Label(id="result_bib", children=f"Click the bubble chart to show EXFOR entries from selected facility."),
-    dbc.Row(aggrid_layout_bib),
-    html.Br(),
-    html.Label("Reactions in selected entries"),
-    dbc.Row(aggrid_index_result(pageparam)),
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    footer,
-]
+            type="circle",
+        ),
+        dcc.Store(id="entries_store_geo"),
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        html.Label(id="result_bib", children=f"Click the bubble chart to show EXFOR entries from selected facility."),
+        dbc.Row(aggrid_layout_bib),
+        html.Br(),
+        html.Label("Reactions in selected entries"),
+        dbc.Row(aggrid_index_result(pageparam)),
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        footer,
+    ]
 
 
 ## EXFOR page layout
@@ -146,7 +164,7 @@ def layout():
                     dbc.Col(
                         [
                             html.Div(
-                                children=geo_right_layout,
+                                children=geo_right_layout(),
                                 style={"margin-right": "20px", "margin-left": "10px"},
                             ),
                         ],
@@ -178,18 +196,7 @@ def redirect_to_pages_geo(dataset):
         raise PreventUpdate
 
 
-@callback(
-    Output("reaction_geo", "options"),
-    Input("incident_particle_geo", "value"),
-)
-def update_reaction_list(proj):
-    print("update_branch_list")
-
-    if not proj:
-        raise PreventUpdate
-
-    else:
-        return generate_exfor_reactions(proj)
+clientside_reaction_options_callback(pageparam, exfor=True)
 
 
 @callback(
@@ -214,14 +221,16 @@ def input_store_geo(
     type, inc_pt, reactions, elem, mass, facility_types, energy_range, year_range
 ):
     # print("input_store_geo")
-    df = geo_df
-    
+    geo_df = get_geo_df()
+
     reactions_exfor_format = []
     level_num = None
-    # df = df[ df["projectile"] == "D"]
+
+    ## categorical filters: lookups in the inverted index of geo_df
+    filters = {}
 
     if facility_types:
-        df = df[df["main_facility_type"].isin([r.upper() for r in facility_types])]
+        filters["main_facility_type"] = [r.upper() for r in facility_types]
 
     if type:
         sf6s = []
@@ -229,28 +238,17 @@ def input_store_geo(
             if any(t == desc["top_category"] for t in type):
                 sf6s += [sf6]
 
-        df = df[df["sf6"].isin(sf6s)]
-
+        filters["sf6"] = sf6s
 
     if elem:
-        df = df[
-            (df["target"].str.contains(f"-{elem.upper()}-"))
-        ]
-
+        filters["element"] = [elem.upper()]
 
     if elem and mass:
         elem, mass, reaction = input_check(type if type else "SIG", elem, mass, reactions[0] if reactions else "N,G")
-        df = df[
-            (df["target"] == x4style_nuclide_expression(elem, mass))
-        ]
-
+        filters["target"] = [x4style_nuclide_expression(elem, mass)]
 
     if inc_pt:
-        df = df[
-            df["projectile"] == inc_pt.upper()
-            if inc_pt.upper() != "H"
-            else df["projectile"] == "HE3"
-        ]
+        filters["projectile"] = [inc_pt.upper() if inc_pt.upper() != "H" else "HE3"]
 
     if reactions:
         rr = []
@@ -271,16 +269,21 @@ def input_store_geo(
 
         reactions_exfor_format = list(dict.fromkeys(rr))
 
-        df = df[df["process"].isin([r.upper() for r in reactions_exfor_format])]
+        filters["process"] = [r.upper() for r in reactions_exfor_format]
 
+    positions = select_geo_rows(filters)
+    if positions is None:
+        positions = np.arange(len(geo_df))
 
+    ## range filters on the selected rows only
     if energy_range:
-        df = df[
-            (df["e_inc_min"] > energy_range[0]) & (df["e_inc_max"] < energy_range[1])
-        ]
+        e_min = geo_df["e_inc_min"].to_numpy()[positions]
+        e_max = geo_df["e_inc_max"].to_numpy()[positions]
+        positions = positions[(e_min > energy_range[0]) & (e_max < energy_range[1])]
 
     if year_range:
-        df = df[(df["year"] > year_range[0]) & (df["year"] < year_range[1])]
+        year = geo_df["year"].to_numpy()[positions]
+        positions = positions[(year > year_range[0]) & (year < year_range[1])]
 
 
     input_dict = {
@@ -294,13 +297,17 @@ def input_store_geo(
         "year_range": year_range,
     }
 
-    return input_dict, df.to_dict("records")
+    ## only the id of the selection goes to entries_store_geo
+    return input_dict, save_geo_selection(positions)
 
 
 
 
 @callback(
-    Output("geo_map", "figure", allow_duplicate=True),
+    [
+        Output("geo_map", "figure", allow_duplicate=True),
+        Output("result_bib", "children", allow_duplicate=True),
+    ],
     [
         Input("grouping", "value"),
         Input("entries_store_geo", "data"),
@@ -310,14 +317,12 @@ def input_store_geo(
 )
 def change_grouping(grouping, entries_store):
     if grouping:
-
-        if entries_store:
-            df = pd.DataFrame(entries_store)
-
-        else:
-            df = geo_df
-
-        return geo_fig(grouping, df)
+        try:
+            return geo_fig(grouping, load_geo_positions(entries_store)), no_update
+        except KeyError as e:
+            ## never fall back to the unfiltered map
+            logger.info(e)
+            return no_update, SELECTION_EXPIRED
 
     raise PreventUpdate
 
@@ -342,11 +347,11 @@ def select_geo_node(entries_store, selected_data):
         return f"Click the bubble chart to show EXFOR entries from selected facility:", no_update
 
     if selected_data:
-        if entries_store:
-            df = pd.DataFrame(entries_store)
-
-        else:
-            df = geo_df
+        try:
+            df = load_geo_selection(entries_store)
+        except KeyError as e:
+            logger.info(e)
+            return SELECTION_EXPIRED, no_update
 
         ## e.g. {'points': [{'curveNumber': 67, 'pointNumber': 291, 'pointIndex': 291, 'lon': -84.3101161, 'lat': 35.9311679, 'marker.size': 211, 'bbox': {'x0': 499.53913841741746, 'x1': 518.7052499914713, 'y0': 362.7159697002503, 'y1': 381.88208127430414}, 'customdata': ['Oak Ridge National Laboratory, Oak Ridge, TN', '1USAORL', 'SPECC', 'Crystal spectrometer']}]}
         facility_name, facility_code, facility_type, facility_type_desc = selected_data[
@@ -369,6 +374,7 @@ def select_geo_node(entries_store, selected_data):
                 "year",
             ]
         ].drop_duplicates()
+        bib_df = object_columns(bib_df)
         bib_df["entry_id_link"] = (
             "[" + bib_df["entry"] + "](../exfor/entry/" + bib_df["entry"] + ")"
         )
@@ -4,6 +4,7 @@ import dash
 from dash import html, dcc, callback, Input, dash_table, Output, State
 import dash_pivottable
 from config import engines
+from modules.exfor.list import get_dataset
 
 dash.register_page(__name__, path="/exfor/index")
 
@@ -14,18 +15,18 @@ def _load_bib():
     return df
 
 
-df = _load_bib()
-
-
 ## dash pivot version
-layout = html.Div(
-    [
-        html.P("pivot"),
-        dash_pivottable.PivotTable(
-            data=[df.columns.values.tolist()] + df.values.tolist(),
-            # cols=["target", "process", "product","sf6"],
-            # rows=["target", "process", "product","sf6"],
-            # vals=["entry"]
-        ),
-    ]
-)
+def layout():
+    df = get_dataset("exfor_reactions", _load_bib)
+
+    return html.Div(
+        [
+            html.P("pivot"),
+            dash_pivottable.PivotTable(
+                data=[df.columns.values.tolist()] + df.values.tolist(),
+                # cols=["target", "process", "product","sf6"],
+                # rows=["target", "process", "product","sf6"],
+                # vals=["entry"]
+            ),
+        ]
+    )
@@ -23,7 +23,7 @@ from pages_common import (
     page_urls,
     exfor_navbar,
     footer,
-    generate_exfor_reactions,
+    clientside_reaction_options_callback,
     remove_query_parameter,
     entry_id_check,
     input_check_elem,
@@ -228,27 +228,28 @@ def input_sch(**query_strings):
     ]
 
 
-search_result_layout = [
-    exfor_navbar,
-    html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    dbc.Row(
-        [
-            dbc.Col(html.Div(id="search_result_count"), width="auto"),
-            dbc.Col(html.A(id="dataeplorer_link", href="#")),
-        ]
-    ),
-    # Main content
-    # html.Div(children=stat_content),
-    html.Div(
-        [
-            ## Aggrid version
-            aggrid_search_result(pageparam),
-        ],
-        style={"margin": "20px"},
-    ),
-    # html.Hr(style={"border": "3px", "border-top": "1px solid"}),
-    footer,
-]
+def search_result_layout():
+    return [
+        exfor_navbar(),
+        html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        dbc.Row(
+            [
+                dbc.Col(html.Div(id="search_result_count"), width="auto"),
+                dbc.Col(html.A(id="dataeplorer_link", href="#")),
+            ]
+        ),
+        # Main content
+        # html.Div(children=stat_content),
+        html.Div(
+            [
+                ## Aggrid version
+                aggrid_search_result(pageparam),
+            ],
+            style={"margin": "20px"},
+        ),
+        # html.Hr(style={"border": "3px", "border-top": "1px solid"}),
+        footer,
+    ]
 
 
 ## EXFOR page layout
@@ -288,7 +289,7 @@ def layout(**query_strings):
                     dbc.Col(
                         [
                             html.Div(
-                                children=search_result_layout,
+                                children=search_result_layout(),
                                 # children=stat_right_layout+search_result_layout
                                 # if not query_strings
                                 # else search_result_layout,
@@ -323,18 +324,7 @@ def redirect_to_pages(dataset):
         raise PreventUpdate
 
 
-@callback(
-    Output("reaction_sch", "options"),
-    Input("incident_particle_sch", "value"),
-)
-def update_reaction_list_sch(proj):
-    print("update_branch_list")
-
-    if not proj:
-        raise PreventUpdate
-
-    else:
-        return generate_exfor_reactions(proj)
+clientside_reaction_options_callback(pageparam, exfor=True)
 
 
 @callback(
@@ -26,30 +26,33 @@ from pages_common import (
     input_check,
     input_target,
     input_general,
-    generate_reactions,
+    clientside_reaction_options_callback,
     remove_query_parameter,
     exfor_filter_opt,
     excl_mxw_switch,
     get_indexes,
     scale_data,
     del_rows_fig,
-    highlight_data,
-    filter_by_year_range,
     fileter_by_en_range,
     export_index,
-    export_data,
     list_link_of_files,
+    trace_index,
+    clientside_figure_callbacks,
+    datasource_store,
+    clientside_datasource_callback,
+    exfor_table_view,
+    get_rows,
+    export_rows,
 )
 
-from modules.reactions.list import color_libs
 from modules.reactions.tabs import create_tabs
+from modules.reactions.figs import lib_traces, exfor_traces
 from submodules.common import (
     generate_exfortables_file_path,
     generate_endftables_file_path,
 )
 from submodules.utilities.reaction import get_mt
-from submodules.exfor.queries import data_query
-from submodules.reactions.queries import lib_da_data_query
+from modules.queries import lib_da_data_query, data_query
 from submodules.utilities.util import get_number_from_string
 
 ## Registration of page
@@ -74,7 +77,6 @@ def input(**query_strings):
 
 
 right_layout_de = [
-    libs_navbar,
     html.Hr(
         style={
             "border": "3px",
@@ -126,6 +128,7 @@ right_layout_de = [
     dcc.Store(id="libs_store_da"),
     html.Hr(style={"border": "3px", "border-top": "1px solid"}),
     create_tabs(pageparam),
+    datasource_store("exfor_table_" + pageparam),
     html.Hr(style={"border": "3px", "border-top": "1px solid"}),
     footer,
 ]
@@ -167,7 +170,7 @@ def layout(**query_strings):
                     dbc.Col(
                         [
                             html.Div(
-                                children=right_layout_de,
+                                children=[libs_navbar()] + right_layout_de,
                                 style={"margin-right": "20px", "margin-left": "10px"},
                             ),
                         ],
@@ -216,18 +219,7 @@ def redirect_to_subpages(type):
         raise PreventUpdate
 
 
-@callback(
-    Output("reaction_da", "options"),
-    Input("incident_particle_da", "value"),
-)
-def update_reaction_list(proj):
-    print("update_reaction_list")
-
-    if not proj:
-        raise PreventUpdate
-
-    else:
-        return generate_reactions(proj)
+clientside_reaction_options_callback(pageparam)
 
 
 @callback(
@@ -368,7 +360,8 @@ def initial_data_da(input_store, r_click):
 @callback(
     [
         Output("main_fig_da", "figure", allow_duplicate=True),
-        Output("exfor_table_da", "rowData"),
+        Output("fig_traces_da", "data"),
+        Output("exfor_table_da_source", "data"),
     ],
     [
         Input("input_store_da", "data"),
@@ -412,78 +405,35 @@ def create_fig_da(input_store, legends, libs):
     if libs:
         print(libs)
         lib_df = lib_da_data_query(libs)
-
-        for l in libs:
-            line_color = color_libs(libs[l])
-            new_col = next(line_color)
-
-            fig.add_trace(
-                go.Scatter(
-                    x=lib_df[lib_df["reaction_id"] == int(l)]["en_inc"].astype(float),
-                    y=lib_df[lib_df["reaction_id"] == int(l)]["data"].astype(float),
-                    showlegend=True,
-                    line_color=new_col,
-                    name=str(libs[l]),
-                    mode="lines",
-                )
-            )
+        fig.add_traces(lib_traces(lib_df, libs, libs))
 
     df = pd.DataFrame()
     if legends:
-        df = data_query(input_store, legends.keys())
-        df["bib"] = df["entry_id"].map(legends)
-        df = pd.concat([df, df["bib"].apply(pd.Series)], axis=1)
-        df = df.drop(columns=["bib"])
-        df["entry_id_link"] = (
-            "[" + df["entry_id"] + "](../exfor/entry/" + df["entry_id"] + ")"
-        )
+        df = exfor_table_view(input_store, legends)
+
+        fig.add_traces(exfor_traces(df, legends, x="angle", dx="dangle"))
+
+    return fig, trace_index(fig), {"rows": len(df)}
+
 
-        i = 0
-        for e in list(legends.keys()):
-            if e == "total_points":
-                continue
-
-            fig.add_trace(
-                go.Scatter(
-                    x=df[df["entry_id"] == e]["angle"],
-                    y=df[df["entry_id"] == e]["data"],
-                    error_x=dict(type="data", array=df[df["entry_id"] == e]["dangle"]),
-                    error_y=dict(type="data", array=df[df["entry_id"] == e]["ddata"]),
-                    showlegend=True,
-                    name=f"{legends[e]['author']}, {legends[e]['year']} [{e}]"
-                    if legends.get(e)
-                    and legends[e].get("author")
-                    and legends[e].get("year")
-                    else f"{legends[e]['author']}, 1900 [{e}]"
-                    if legends.get(e)
-                    else e,
-                    marker=dict(size=8, symbol=i),
-                    mode="markers",
-                )
-            )
-            i += 1
-
-            if i == 30:
-                i = 1
-
-    return fig, df.to_dict("records")
+clientside_figure_callbacks(pageparam)
+clientside_datasource_callback("exfor_table_" + pageparam)
 
 
 @callback(
-    Output("main_fig_da", "figure", allow_duplicate=True),
+    Output("exfor_table_da", "getRowsResponse"),
+    Input("exfor_table_da", "getRowsRequest"),
     [
-        Input("xaxis_type_da", "value"),
-        Input("yaxis_type_da", "value"),
+        State("input_store_da", "data"),
+        State("entries_store_da", "data"),
     ],
-    State("main_fig_da", "figure"),
     prevent_initial_call=True,
 )
-def update_axis(xaxis_type, yaxis_type, fig):
-    ## Switch the axis type
-    fig.get("layout").get("yaxis").update({"type": yaxis_type})
-    fig.get("layout").get("xaxis").update({"type": xaxis_type})
+def exfor_table_rows_da(request, input_store, legends):
+    if not request:
+        raise PreventUpdate
 
-    return fig
+    return get_rows(request, input_store, legends)
 
 
 @callback(
@@ -492,63 +442,56 @@ def update_axis(xaxis_type, yaxis_type, fig):
         Output("index_table_da", "filter_query"),
     ],
     Input("energy_range_da", "value"),
-    State("main_fig_da", "figure"),
+    State("fig_traces_da", "data"),
     prevent_initial_call=True,
 )
-def fileter_by_range_lib(energy_range, fig):
-    return fileter_by_en_range(energy_range, fig)
+def fileter_by_range_lib(energy_range, fig_traces):
+    return fileter_by_en_range(energy_range, fig_traces)
 
 
 @callback(
     [
         Output("main_fig_da", "figure", allow_duplicate=True),
-        Output("index_table_da", "filterModel", allow_duplicate=True),
+        Output("fig_traces_da", "data", allow_duplicate=True),
+    ],
+    Input("index_table_da", "cellValueChanged"),
+    [
+        State("fig_traces_da", "data"),
+        State("input_store_da", "data"),
+        State("entries_store_da", "data"),
     ],
-    Input("year_range_da", "value"),
-    State("main_fig_da", "figure"),
-    prevent_initial_call=True,
-)
-def fileter_by_year_range_lib(year_range, fig):
-    return filter_by_year_range(year_range, fig)
-
-
-@callback(
-    Output("main_fig_da", "figure", allow_duplicate=True),
-    Input("index_table_da", "selectedRows"),
-    State("main_fig_da", "figure"),
     prevent_initial_call=True,
 )
-def highlight_data_xs(selected, fig):
-    return highlight_data(selected, fig)
+def scale_data_da(selected, fig_traces, input_store, legends):
+    if not selected or not fig_traces or not legends:
+        raise PreventUpdate
 
+    ## the dataset as it is shown in the figure, from the cached query
+    entry_id = selected["data"]["entry_id"]
+    df = data_query(input_store, legends.keys())
+    traces = exfor_traces(df, {entry_id: legends[entry_id]}, x="angle", dx="dangle")
 
-@callback(
-    Output("main_fig_da", "figure", allow_duplicate=True),
-    Input("index_table_da", "cellValueChanged"),
-    State("main_fig_da", "figure"),
-    prevent_initial_call=True,
-)
-def scale_data_xs(selected, fig):
-    return scale_data(selected, fig)
+    return scale_data(selected, fig_traces, traces[0])
 
 
 @callback(
     [
         Output("main_fig_da", "figure", allow_duplicate=True),
+        Output("fig_traces_da", "data", allow_duplicate=True),
         Output("index_table_da", "rowTransaction"),
     ],
     Input("del_btn_da", "n_clicks"),
     [
-        State("main_fig_da", "figure"),
+        State("fig_traces_da", "data"),
         State("index_table_da", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def del_rows_da(n1, fig, selected):
+def del_rows_da(n1, fig_traces, selected):
     if n1:
         if selected is None:
-            return no_update, no_update
-        return del_rows_fig(selected, fig)
+            return no_update, no_update, no_update
+        return del_rows_fig(selected, fig_traces)
 
 
 @callback(
@@ -579,30 +522,31 @@ def export_index_xs(n1, n2, input_store):
 
 
 @callback(
-    [
-        Output("exfor_table_da", "exportDataAsCsv"),
-        Output("exfor_table_da", "csvExportParams"),
-    ],
+    Output("download_exfor_da", "data"),
     [
         Input("btn_csv_exfor_da", "n_clicks"),
         Input("btn_csv_exfor_selct_da", "n_clicks"),
-        Input("input_store_da", "data"),
+    ],
+    [
+        State("input_store_da", "data"),
+        State("entries_store_da", "data"),
+        State("exfor_table_da", "filterModel"),
+        State("exfor_table_da", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def export_data_xs(n1, n2, input_store):
-    # return export_data(n_clicks_all, n_clicks_slctd, input_store)
+def export_data_xs(n1, n2, input_store, legends, filter_model, selected):
     if not input_store:
         raise PreventUpdate
 
     if ctx.triggered_id == "btn_csv_exfor_da":
-        return export_data(False, input_store)
+        return export_rows(False, input_store, legends, filter_model, selected)
 
     elif ctx.triggered_id == "btn_csv_exfor_selct_da":
-        return export_data(True, input_store)
+        return export_rows(True, input_store, legends, filter_model, selected)
 
     else:
-        return no_update, no_update
+        return no_update
 
 
 @callback(
@@ -25,11 +25,19 @@ from pages_common import (
     input_general,
     exfor_filter_opt,
     energy_range_conversion,
+    merge_bib,
+    fig_progress,
+    background_callback,
 )
 
 from submodules.utilities.reaction import reaction_list
 from modules.reactions.tabs import create_tabs
-from modules.reactions.figs import default_chart, default_axis
+from modules.reactions.figs import (
+    default_chart,
+    default_axis,
+    exfor_traces,
+    legend_name_short,
+)
 from submodules.reactions.queries import (
     lib_query,
     lib_xs_data_query,
@@ -74,7 +82,6 @@ main_fig_de = dcc.Graph(
 
 
 right_layout_de = [
-    libs_navbar,
     html.Hr(style={"border": "3px", "border-top": "1px solid"}),
     html.Div(id="result_cont_de"),
     # Log/Linear switch
@@ -110,6 +117,7 @@ right_layout_de = [
             ),
         ]
     ),
+    fig_progress(pageparam),
     dcc.Loading(
         children=main_fig_de,
         type="circle",
@@ -157,7 +165,7 @@ def layout(**query_strings):
                     dbc.Col(
                         [
                             html.Div(
-                                children=right_layout_de,
+                                children=[libs_navbar()] + right_layout_de,
                                 style={"margin-right": "20px", "margin-left": "10px"},
                             ),
                         ],
@@ -225,7 +233,7 @@ def update_url_de(type, elem, mass, reaction):
         raise PreventUpdate
 
 
-@callback(
+@background_callback(
     [
         Output("result_cont_de", "children"),
         Output("main_fig_de", "figure"),
@@ -238,9 +246,10 @@ def update_url_de(type, elem, mass, reaction):
         Input("target_mass_de", "value"),
         Input("reaction_de", "value"),
     ],
+    pageparam=pageparam,
     # prevent_initial_call=True,
 )
-def update_fig_de(type, elem, mass, reaction):
+def update_fig_de(set_progress, type, elem, mass, reaction):
     elem, mass, reaction = input_check(type, elem, mass, reaction)
     print(type, elem, mass, reaction)
     df = pd.DataFrame()
@@ -287,28 +296,15 @@ def update_fig_de(type, elem, mass, reaction):
             for t, v in entries.items()
             if k == t[:5]
         }
+        set_progress(30)
         df = data_query(entries.keys())
+        set_progress(70)
 
-        i = 0
-        for e in legend.keys():
-            fig.add_trace(
-                go.Scatter(
-                    x=df[df["entry_id"] == e]["e_out"],
-                    y=df[df["entry_id"] == e]["data"],
-                    error_x=dict(type="data", array=df[df["entry_id"] == e]["de_out"]),
-                    error_y=dict(type="data", array=df[df["entry_id"] == e]["ddata"]),
-                    showlegend=True,
-                    name=f"{legend[e]['author']}, {legend[e]['year']}"
-                    if legend[e].get("year")
-                    else legend[e]["author"],
-                    marker=dict(size=8, symbol=i),
-                    mode="markers",
-                )
+        fig.add_traces(
+            exfor_traces(
+                df, legend, x="e_out", dx="de_out", name=legend_name_short
             )
-            i += 1
-
-            if i == 30:
-                i = 1
+        )
 
         index_df = pd.DataFrame.from_dict(legend, orient="index").reset_index()
         index_df.rename(columns={"index": "entry_id"}, inplace=True)
@@ -319,9 +315,7 @@ def update_fig_de(type, elem, mass, reaction):
             + index_df["entry_id"]
             + ")"
         )
-        df["bib"] = df["entry_id"].map(legend)
-        df = pd.concat([df, df["bib"].apply(pd.Series)], axis=1)
-        df = df.drop(columns=["bib"])
+        df = merge_bib(df, legend)
         df["entry_id_link"] = (
             "[" + df["entry_id"] + "](../exfor/entry/" + df["entry_id"] + ")"
         )
@@ -25,6 +25,9 @@ from pages_common import (
     lib_page_urls,
     input_check,
     energy_range_conversion,
+    merge_bib,
+    fig_progress,
+    background_callback,
 )
 from submodules.utilities.elem import elemtoz_nz
 from submodules.utilities.mass import mass_range
@@ -32,7 +35,12 @@ from submodules.utilities.mass import mass_range
 
 from submodules.utilities.reaction import reaction_list
 from modules.reactions.tabs import create_tabs
-from modules.reactions.figs import default_chart, default_axis
+from modules.reactions.figs import (
+    default_chart,
+    default_axis,
+    exfor_traces,
+    legend_name_short,
+)
 from submodules.reactions.queries import (
     lib_query,
     lib_xs_data_query,
@@ -152,7 +160,6 @@ main_fig_fy = dcc.Graph(
 
 ## Layout of right panel
 right_layout_fy = [
-    libs_navbar,
     html.Hr(style={"border": "3px", "border-top": "1px solid"}),
     html.Div(id="result_cont_fis"),
     # Log/Linear switch
@@ -188,6 +195,7 @@ right_layout_fy = [
             ),
         ]
     ),
+    fig_progress("fis"),
     dcc.Loading(
         children=main_fig_fy,
         type="circle",
@@ -236,7 +244,7 @@ def layout(**query_strings):
                     dbc.Col(
                         [
                             html.Div(
-                                children=right_layout_fy,
+                                children=[libs_navbar()] + right_layout_fy,
                                 style={"margin-right": "20px", "margin-left": "10px"},
                             ),
                         ],
@@ -307,7 +315,7 @@ def redirection_fy(type, elem, mass, reaction):
         raise PreventUpdate
 
 
-@callback(
+@background_callback(
     [
         Output("result_cont_fis", "children"),
         Output("main_fig_fis", "figure"),
@@ -322,8 +330,9 @@ def redirection_fy(type, elem, mass, reaction):
         Input("reac_branch_fis", "value"),
         Input("energy_range_fis", "value"),
     ],
+    pageparam="fis",
 )
-def update_fig_fy(type, elem, mass, reaction, branch, energy_range):
+def update_fig_fy(set_progress, type, elem, mass, reaction, branch, energy_range):
     input_check(type, elem, mass, reaction)
     print(type, elem, mass, reaction, branch)
 
@@ -357,52 +366,21 @@ def update_fig_fy(type, elem, mass, reaction, branch, energy_range):
         }
 
         ## All data
+        set_progress(30)
         df = data_query(entries.keys())
+        set_progress(70)
         ## Some case like 41084-007-0 contains None in residual
         reac_products = sorted([i for i in df["residual"].unique() if i is not None])
 
-        df2 = df.copy()
-
-        i = 0
-        # ------
-        for e in legend.keys():
-            if any(branch == b for b in ("nu_n", "nu_g", "dn")):
-                fig.add_trace(
-                    go.Scatter(
-                        x=df2[df2["entry_id"] == e]["en_inc"],
-                        y=df2[df2["entry_id"] == e]["data"],
-                        error_y=dict(
-                            type="data", array=df[df["entry_id"] == e]["ddata"]
-                        ),
-                        showlegend=True,
-                        name=f"{legend[e]['author']}, {legend[e]['year']}"
-                        if legend[e].get("year")
-                        else legend[e]["author"],
-                        marker=dict(size=8, symbol=i),
-                        mode="markers",
-                    )
-                )
-            elif any(branch == b for b in ("pfns", "pfgs")):
-                fig.add_trace(
-                    go.Scatter(
-                        x=df2[df2["entry_id"] == e]["e_out"],
-                        y=df2[df2["entry_id"] == e]["data"],
-                        error_y=dict(
-                            type="data", array=df[df["entry_id"] == e]["ddata"]
-                        ),
-                        showlegend=True,
-                        name=f"{legend[e]['author']}, {legend[e]['year']}"
-                        if legend[e].get("year")
-                        else legend[e]["author"],
-                        marker=dict(size=8, symbol=i),
-                        mode="markers",
-                    )
-                )
-            i += 1
-
-            if i == 30:
-                i = 1
-        # ------
+        if any(branch == b for b in ("nu_n", "nu_g", "dn")):
+            fig.add_traces(
+                exfor_traces(df, legend, x="en_inc", name=legend_name_short)
+            )
+
+        elif any(branch == b for b in ("pfns", "pfgs")):
+            fig.add_traces(
+                exfor_traces(df, legend, x="e_out", name=legend_name_short)
+            )
 
         index_df = pd.DataFrame.from_dict(legend, orient="index").reset_index()
         index_df.rename(columns={"index": "entry_id"}, inplace=True)
@@ -413,9 +391,7 @@ def update_fig_fy(type, elem, mass, reaction, branch, energy_range):
             + index_df["entry_id"]
             + ")"
         )
-        df["bib"] = df["entry_id"].map(legend)
-        df = pd.concat([df, df["bib"].apply(pd.Series)], axis=1)
-        df = df.drop(columns=["bib"])
+        df = merge_bib(df, legend)
         df["entry_id_link"] = (
             "["
             + df["entry_id"]
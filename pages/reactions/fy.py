@@ -22,7 +22,6 @@ from pages_common import (
     libs_navbar,
     page_urls,
     lib_page_urls,
-    URL_PATH,
     main_fig,
     input_check,
     input_obs,
@@ -33,17 +32,27 @@ from pages_common import (
     get_indexes,
     scale_data,
     del_rows_fig,
-    highlight_data,
-    filter_by_year_range,
     fileter_by_en_range,
     export_index,
-    export_data,
     list_link_of_files,
     generate_api_link,
+    trace_index,
+    clientside_figure_callbacks,
+    datasource_store,
+    clientside_datasource_callback,
+    exfor_table_view,
+    get_rows,
+    export_rows,
+    fig_progress,
+    background_callback,
 )
 
-from modules.reactions.list import color_libs
-from modules.reactions.figs import default_chart, default_axis
+from modules.reactions.figs import (
+    default_chart,
+    default_axis,
+    lib_traces,
+    exfor_traces,
+)
 from modules.reactions.tabs import create_tabs
 
 from submodules.common import (
@@ -51,8 +60,7 @@ from submodules.common import (
     generate_endftables_file_path,
 )
 from submodules.utilities.reaction import MT_BRANCH_LIST_FY
-from submodules.reactions.queries import lib_fy_data_query
-from submodules.exfor.queries import data_query
+from modules.queries import lib_fy_data_query, data_query
 
 
 ## Registration of page
@@ -120,7 +128,6 @@ def input_fy(**query_strings):
 
 ## Layout of right panel
 right_layout_fy = [
-    libs_navbar,
     html.Hr(
         style={
             "border": "3px",
@@ -177,11 +184,13 @@ right_layout_fy = [
             ),
         ]
     ),
+    fig_progress(pageparam),
     main_fig(pageparam),
     dcc.Store(id="entries_store_fy"),
     dcc.Store(id="libs_store_fy"),
     html.Hr(style={"border": "3px", "border-top": "1px solid"}),
     create_tabs(pageparam),
+    datasource_store("exfor_table_" + pageparam),
     footer,
 ]
 
@@ -222,7 +231,7 @@ def layout(**query_strings):
                     dbc.Col(
                         [
                             html.Div(
-                                children=right_layout_fy,
+                                children=[libs_navbar()] + right_layout_fy,
                                 style={"margin-right": "20px", "margin-left": "10px"},
                             ),
                         ],
@@ -391,11 +400,30 @@ def initial_data_fy(input_store, r_click):
         raise PreventUpdate
 
 
-@callback(
+def fy_x_axis(input_store, plot_opt_fy):
+    ## column on the x axis for the EXFOR data
+    if plot_opt_fy == "Mass":
+        return "mass"
+
+    elif plot_opt_fy == "Charge":
+        return "charge"
+
+    elif plot_opt_fy == "Energy":
+        return "en_inc"
+
+    elif input_store.get("mesurement_opt_fy") == "Z":
+        return "charge"
+
+    else:
+        return "mass"
+
+
+@background_callback(
     [
         Output("main_fig_fy", "figure", allow_duplicate=True),
+        Output("fig_traces_fy", "data"),
         Output("reac_product_fy", "options"),
-        Output("exfor_table_fy", "rowData"),
+        Output("exfor_table_fy_source", "data"),
     ],
     [
         Input("input_store_fy", "data"),
@@ -404,14 +432,20 @@ def initial_data_fy(input_store, r_click):
         Input("endf_selct_fy", "value"),
         Input("plot_opt_fy", "value"),
     ],
+    pageparam=pageparam,
+    cancel=[
+        Input("target_elem_fy", "value"),
+        Input("target_mass_fy", "value"),
+        Input("reaction_fy", "value"),
+        Input("reac_branch_fy", "value"),
+    ],
     prevent_initial_call=True,
 )
-def create_fig_fy(input_store, legends, libs, endf_selct, plot_opt_fy):
+def create_fig_fy(set_progress, input_store, legends, libs, endf_selct, plot_opt_fy):
     # print("create_fig")
     if input_store:
         reaction = input_store.get("reaction")
         mt = input_store.get("mt")
-        mesurement_opt_fy = input_store.get("mesurement_opt_fy")
         reac_product_fy = input_store.get("reac_product_fy")
 
     else:
@@ -456,20 +490,7 @@ def create_fig_fy(input_store, legends, libs, endf_selct, plot_opt_fy):
                 "data"
             ].max(numeric_only=True)
 
-            for l in libs_select:
-                line_color = color_libs(libs[l])
-                new_col = next(line_color)
-
-                fig.add_trace(
-                    go.Scatter(
-                        x=dff[dff["reaction_id"] == int(l)]["mass"].astype(float),
-                        y=dff[dff["reaction_id"] == int(l)]["data"].astype(float),
-                        showlegend=True,
-                        line_color=new_col,
-                        name=str(libs[l]),
-                        mode="lines",
-                    )
-                )
+            fig.add_traces(lib_traces(dff, libs, libs_select, x="mass"))
 
             fig.update_layout(
                 dict(xaxis={"title": "Mass number"}, xaxis_range=[60, 180])
@@ -482,20 +503,7 @@ def create_fig_fy(input_store, legends, libs, endf_selct, plot_opt_fy):
                 "data"
             ].max(numeric_only=True)
 
-            for l in libs_select:
-                line_color = color_libs(libs[l])
-                new_col = next(line_color)
-
-                fig.add_trace(
-                    go.Scatter(
-                        x=dff[dff["reaction_id"] == int(l)]["charge"].astype(float),
-                        y=dff[dff["reaction_id"] == int(l)]["data"].astype(float),
-                        showlegend=True,
-                        line_color=new_col,
-                        name=str(libs[l]),
-                        mode="lines",
-                    )
-                )
+            fig.add_traces(lib_traces(dff, libs, libs_select, x="charge"))
             fig.update_layout(
                 dict(xaxis={"title": "Charge number"}, xaxis_range=[20, 80])
             )
@@ -506,103 +514,58 @@ def create_fig_fy(input_store, legends, libs, endf_selct, plot_opt_fy):
                 dict(xaxis={"title": "Incident energy [MeV]"}, xaxis_range=[0, 20])
             )
 
+    set_progress(30)
+
     reac_products = []
     df = pd.DataFrame()
 
     if legends:
-        df = data_query(input_store, legends.keys())
-        df["bib"] = df["entry_id"].map(legends)
-        df = pd.concat([df, df["bib"].apply(pd.Series)], axis=1)
-        df = df.drop(columns=["bib"])
-
-        df["entry_id_link"] = (
-            "["
-            + df["entry_id"]
-            + "]("
-            + URL_PATH
-            + "exfor/entry/"
-            + df["entry_id"]
-            + ")"
-        )
+        df = exfor_table_view(input_store, legends)
+        set_progress(70)
         # print(df)
         reac_products = sorted([i for i in df["residual"].unique() if i is not None])
         # print(reac_products)
-        i = 0
-        for e in list(legends.keys()):
-            if e == "total_points":
-                continue
-
-            df2 = df[df["entry_id"] == e]
-
-            # Filtered by reaction product
-            if reac_product_fy:
-                df2 = df2[df2["residual"].isin(reac_product_fy)]
-
-            if mesurement_opt_fy == "A":
-                x_ax = "mass"
-
-            elif mesurement_opt_fy == "Z":
-                x_ax = "charge"
-
-            else:
-                x_ax = "mass"
-
-            if plot_opt_fy == "Mass":
-                x_ax = "mass"
-                fig.update_layout(dict(xaxis={"title": "Mass number"}))
-
-            elif plot_opt_fy == "Charge":
-                x_ax = "charge"
-                fig.update_layout(dict(xaxis={"title": "Charge number"}))
-
-            elif plot_opt_fy == "Energy":
-                x_ax = "en_inc"
-                fig.update_layout(dict(xaxis={"title": "Incident energy [MeV]"}))
-
-            i = 0
-            # ------
-
-            fig.add_trace(
-                go.Scatter(
-                    x=df2[df2["entry_id"] == e][x_ax],
-                    y=df2[df2["entry_id"] == e]["data"],
-                    error_y=dict(type="data", array=df[df["entry_id"] == e]["ddata"]),
-                    showlegend=True,
-                    name=f"{legends[e]['author']}, {legends[e]['year']} [{e}]"
-                    if legends.get(e)
-                    and legends[e].get("author")
-                    and legends[e].get("year")
-                    else f"{legends[e]['author']}, 1900 [{e}]"
-                    if legends.get(e)
-                    else e,
-                    marker=dict(size=8, symbol=i),
-                    mode="markers",
-                )
-            )
-            i += 1
+        x_ax = fy_x_axis(input_store, plot_opt_fy)
+
+        if plot_opt_fy == "Mass":
+            fig.update_layout(dict(xaxis={"title": "Mass number"}))
+
+        elif plot_opt_fy == "Charge":
+            fig.update_layout(dict(xaxis={"title": "Charge number"}))
+
+        elif plot_opt_fy == "Energy":
+            fig.update_layout(dict(xaxis={"title": "Incident energy [MeV]"}))
 
-            if i == 30:
-                i = 1
-        # ------
+        # Filtered by reaction product
+        df2 = df
+        if reac_product_fy:
+            df2 = df[df["residual"].isin(reac_product_fy)]
 
-    return fig, reac_products, df.to_dict("records")
+        fig.add_traces(exfor_traces(df2, legends, x=x_ax))
+
+    set_progress(100)
+
+    return fig, trace_index(fig), reac_products, {"rows": len(df)}
+
+
+clientside_figure_callbacks(pageparam, axis_ids=("xaxis_type", "yaxis_type"))
+clientside_datasource_callback("exfor_table_" + pageparam)
 
 
 @callback(
-    Output("main_fig_fy", "figure", allow_duplicate=True),
+    Output("exfor_table_fy", "getRowsResponse"),
+    Input("exfor_table_fy", "getRowsRequest"),
     [
-        Input("xaxis_type", "value"),
-        Input("yaxis_type", "value"),
+        State("input_store_fy", "data"),
+        State("entries_store_fy", "data"),
     ],
-    State("main_fig_fy", "figure"),
     prevent_initial_call=True,
 )
-def update_axis_fy(xaxis_type, yaxis_type, fig):
-    ## Switch the axis type
-    fig.get("layout").get("yaxis").update({"type": yaxis_type})
-    fig.get("layout").get("xaxis").update({"type": xaxis_type})
+def exfor_table_rows_fy(request, input_store, legends):
+    if not request:
+        raise PreventUpdate
 
-    return fig
+    return get_rows(request, input_store, legends)
 
 
 @callback(
@@ -612,67 +575,70 @@ def update_axis_fy(xaxis_type, yaxis_type, fig):
         Output("output_energy_slider_fy", "children"),
     ],
     Input("energy_range_fy", "value"),
-    State("main_fig_fy", "figure"),
+    State("fig_traces_fy", "data"),
     prevent_initial_call=True,
 )
-def fileter_by_en_range_fy(energy_range, fig):
+def fileter_by_en_range_fy(energy_range, fig_traces):
     range_text = ""
-    fig, filter_model = fileter_by_en_range(energy_range, fig)
+    patched, filter_model = fileter_by_en_range(energy_range, fig_traces)
     if filter_model:
         range_text = f"{filter_model['e_inc_min']['filter']:.2e} - {filter_model['e_inc_max']['filter']:.2e} MeV"
-    return fig, filter_model, range_text
+    return patched, filter_model, range_text
 
 
 @callback(
     [
         Output("main_fig_fy", "figure", allow_duplicate=True),
-        Output("index_table_fy", "filterModel", allow_duplicate=True),
+        Output("fig_traces_fy", "data", allow_duplicate=True),
+    ],
+    Input("index_table_fy", "cellValueChanged"),
+    [
+        State("fig_traces_fy", "data"),
+        State("input_store_fy", "data"),
+        State("entries_store_fy", "data"),
+        State("plot_opt_fy", "value"),
     ],
-    Input("year_range_fy", "value"),
-    State("main_fig_fy", "figure"),
     prevent_initial_call=True,
 )
-def fileter_by_year_range_fy(year_range, fig):
-    return filter_by_year_range(year_range, fig)
+def scale_data_fy(selected, fig_traces, input_store, legends, plot_opt_fy):
+    if not selected or not fig_traces or not legends:
+        raise PreventUpdate
 
+    ## the dataset as it is shown in the figure, from the cached query
+    entry_id = selected["data"]["entry_id"]
+    df = data_query(input_store, legends.keys())
 
-@callback(
-    Output("main_fig_fy", "figure", allow_duplicate=True),
-    Input("index_table_fy", "selectedRows"),
-    State("main_fig_fy", "figure"),
-    prevent_initial_call=True,
-)
-def highlight_data_fy(selected, fig):
-    return highlight_data(selected, fig)
+    reac_product_fy = input_store.get("reac_product_fy")
+    if reac_product_fy:
+        df = df[df["residual"].isin(reac_product_fy)]
 
+    traces = exfor_traces(
+        df,
+        {entry_id: legends[entry_id]},
+        x=fy_x_axis(input_store, plot_opt_fy),
+    )
 
-@callback(
-    Output("main_fig_fy", "figure", allow_duplicate=True),
-    Input("index_table_fy", "cellValueChanged"),
-    State("main_fig_fy", "figure"),
-    prevent_initial_call=True,
-)
-def scale_data_fy(selected, fig):
-    return scale_data(selected, fig)
+    return scale_data(selected, fig_traces, traces[0])
 
 
 @callback(
     [
         Output("main_fig_fy", "figure", allow_duplicate=True),
+        Output("fig_traces_fy", "data", allow_duplicate=True),
         Output("index_table_fy", "rowTransaction"),
     ],
     Input("del_btn_fy", "n_clicks"),
     [
-        State("main_fig_fy", "figure"),
+        State("fig_traces_fy", "data"),
         State("index_table_fy", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def del_rows_fy(n1, fig, selected):
+def del_rows_fy(n1, fig_traces, selected):
     if n1:
         if selected is None:
-            return no_update, no_update
-        return del_rows_fig(selected, fig)
+            return no_update, no_update, no_update
+        return del_rows_fig(selected, fig_traces)
 
 
 @callback(
@@ -703,30 +669,31 @@ def export_index_fy(n1, n2, input_store):
 
 
 @callback(
-    [
-        Output("exfor_table_fy", "exportDataAsCsv"),
-        Output("exfor_table_fy", "csvExportParams"),
-    ],
+    Output("download_exfor_fy", "data"),
     [
         Input("btn_csv_exfor_fy", "n_clicks"),
         Input("btn_csv_exfor_selct_fy", "n_clicks"),
-        Input("input_store_fy", "data"),
+    ],
+    [
+        State("input_store_fy", "data"),
+        State("entries_store_fy", "data"),
+        State("exfor_table_fy", "filterModel"),
+        State("exfor_table_fy", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def export_data_fy(n1, n2, input_store):
-    # return export_data(n_clicks_all, n_clicks_slctd, input_store)
+def export_data_fy(n1, n2, input_store, legends, filter_model, selected):
     if not input_store:
         raise PreventUpdate
 
     if ctx.triggered_id == "btn_csv_exfor_fy":
-        return export_data(False, input_store)
+        return export_rows(False, input_store, legends, filter_model, selected)
 
     elif ctx.triggered_id == "btn_csv_exfor_selct_fy":
-        return export_data(True, input_store)
+        return export_rows(True, input_store, legends, filter_model, selected)
 
     else:
-        return no_update, no_update
+        return no_update
 
 
 @callback(
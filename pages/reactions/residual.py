@@ -7,12 +7,10 @@
 #
 ####################################################################
 
-import pandas as pd
 import dash
 import re
 from dash import Dash, html, dcc, Input, Output, State, ctx, no_update, callback
 import dash_bootstrap_components as dbc
-import plotly.graph_objects as go
 from dash.exceptions import PreventUpdate
 
 from pages_common import (
@@ -23,7 +21,6 @@ from pages_common import (
     page_urls,
     lib_page_urls,
     def_inp_values,
-    URL_PATH,
     main_fig,
     input_check,
     input_obs,
@@ -31,7 +28,6 @@ from pages_common import (
     input_residual,
     input_check_elem,
     exfor_filter_opt,
-    limit_number_of_datapoints,
     libs_filter_opt,
     input_lin_log_switch,
     reduce_data_switch,
@@ -39,29 +35,37 @@ from pages_common import (
     get_indexes,
     scale_data,
     del_rows_fig,
-    highlight_data,
-    filter_by_year_range,
     fileter_by_en_range,
     export_index,
-    export_data,
     list_link_of_files,
     generate_api_link,
+    relayout_x_range,
+    apply_relayout,
+    trace_index,
+    clientside_figure_callbacks,
+    datasource_store,
+    clientside_datasource_callback,
+    exfor_table_view,
+    get_rows,
+    export_rows,
 )
 
-from modules.reactions.list import color_libs
 from modules.reactions.tabs import create_tabs
-from modules.reactions.figs import default_chart
+from modules.reactions.figs import (
+    default_chart,
+    lib_traces,
+    exfor_traces,
+    update_trace_data,
+)
+from modules.reactions.downsample import point_budget
 
 from submodules.utilities.util import split_by_number
 from submodules.common import (
     generate_exfortables_file_path,
     generate_endftables_file_path,
 )
-from submodules.reactions.queries import (
-    lib_residual_data_query,
-    lib_residual_nuclide_list,
-)
-from submodules.exfor.queries import data_query
+from submodules.reactions.queries import lib_residual_nuclide_list
+from modules.queries import lib_residual_data_query, data_query, fetch_all
 
 
 ## Registration of page
@@ -112,7 +116,6 @@ def input_lib(**query_strings):
 
 ## Layout of right panel
 right_layout_lib = [
-    libs_navbar,
     html.Hr(
         style={
             "border": "3px",
@@ -129,6 +132,7 @@ right_layout_lib = [
     dcc.Store(id="libs_store_rp"),
     html.Hr(style={"border": "3px", "border-top": "1px solid"}),
     create_tabs(pageparam),
+    datasource_store("exfor_table_" + pageparam),
     footer,
 ]
 
@@ -171,7 +175,7 @@ def layout(**query_strings):
                     dbc.Col(
                         [
                             html.Div(
-                                children=right_layout_lib,
+                                children=[libs_navbar()] + right_layout_lib,
                                 style={"margin-right": "20px", "margin-left": "10px"},
                             ),
                         ],
@@ -390,7 +394,8 @@ def initial_data_rp(input_store, r_click):
 @callback(
     [
         Output("main_fig_rp", "figure", allow_duplicate=True),
-        Output("exfor_table_rp", "rowData"),
+        Output("fig_traces_rp", "data"),
+        Output("exfor_table_rp_source", "data"),
         Output("xaxis_type_rp", "value"),
         Output("yaxis_type_rp", "value"),
     ],
@@ -419,102 +424,129 @@ def create_fig_rp(input_store, legends, libs, endf_selct, switcher):
 
     fig = default_chart(xaxis_type, yaxis_type, reaction=inc_pt)
 
-    lib_df = pd.DataFrame()
+    ## points per trace, the same for every trace of the figure
+    budget = point_budget(len(libs or {}) + len(legends or {}))
+
+    libs_select = []
     if libs:
         if endf_selct:
             libs_select = [k for k, l in libs.items() if l in endf_selct]
         else:
-            libs_select = libs.keys()
-
-        lib_df = lib_residual_data_query(inc_pt, libs_select)
-
-        for l in libs_select:
-            line_color = color_libs(libs[l])
-            new_col = next(line_color)
-
-            fig.add_trace(
-                go.Scatter(
-                    x=lib_df[lib_df["reaction_id"] == int(l)]["en_inc"].astype(float),
-                    y=lib_df[lib_df["reaction_id"] == int(l)]["data"].astype(float),
-                    showlegend=True,
-                    line_color=new_col,
-                    name=str(libs[l]),
-                    mode="lines",
-                )
-            )
+            libs_select = list(libs.keys())
+
+    ## ENDFTABLES and EXFOR are queried at the same time
+    lib_df, df = fetch_all(
+        (lib_residual_data_query, inc_pt, libs_select) if libs else None,
+        (exfor_table_view, input_store, legends) if legends else None,
+    )
+
+    if libs:
+        fig.add_traces(lib_traces(lib_df, libs, libs_select, max_points=budget))
 
-    df = pd.DataFrame()
     if legends:
-        df = data_query(input_store, legends.keys())
-        df["bib"] = df["entry_id"].map(legends)
-        df = pd.concat([df, df["bib"].apply(pd.Series)], axis=1)
-        df = df.drop(columns=["bib"])
-
-        df["entry_id_link"] = (
-            "["
-            + df["entry_id"]
-            + "]("
-            + URL_PATH
-            + "exfor/entry/"
-            + df["entry_id"]
-            + ")"
-        )
-        i = 0
-        for e in list(legends.keys()):
-            if e == "total_points":
-                continue
-
-            if switcher:
-                df2 = limit_number_of_datapoints(
-                    legends[e]["points"], df[df["entry_id"] == e]
-                )
-
-            else:
-                df2 = df[df["entry_id"] == e]
-
-            fig.add_trace(
-                go.Scatter(
-                    x=df2["en_inc"],
-                    y=df2["data"],
-                    error_x=dict(type="data", array=df2["den_inc"]),
-                    error_y=dict(type="data", array=df2["ddata"]),
-                    showlegend=True,
-                    name=f"{legends[e]['author']}, {legends[e]['year']} [{e}]"
-                    if legends.get(e)
-                    and legends[e].get("author")
-                    and legends[e].get("year")
-                    else f"{legends[e]['author']}, 1900 [{e}]"
-                    if legends.get(e)
-                    else e,
-                    marker=dict(size=8, symbol=i),
-                    mode="markers",
-                )
+        fig.add_traces(
+            exfor_traces(
+                df,
+                legends,
+                x="en_inc",
+                dx="den_inc",
+                max_points=budget if switcher else None,
             )
-            i += 1
+        )
+
+    return (
+        fig,
+        trace_index(fig),
+        {"rows": len(df) if legends else 0},
+        xaxis_type,
+        yaxis_type,
+    )
+
+
+@callback(
+    [
+        Output("main_fig_rp", "figure", allow_duplicate=True),
+        Output("fig_traces_rp", "data", allow_duplicate=True),
+    ],
+    Input("main_fig_rp", "relayoutData"),
+    [
+        State("fig_traces_rp", "data"),
+        State("xaxis_type_rp", "value"),
+        State("input_store_rp", "data"),
+        State("entries_store_rp", "data"),
+        State("libs_store_rp", "data"),
+        State("endf_selct_rp", "value"),
+        State("reduce_data_switch_rp", "value"),
+    ],
+    prevent_initial_call=True,
+)
+def zoom_fig_rp(
+    relayout, fig_traces, xaxis_type, input_store, legends, libs, endf_selct, switcher
+):
+    ## reload the points of the visible energy window at full budget
+    x_range = relayout_x_range(relayout, xaxis_type)
+    if x_range is False or not fig_traces:
+        raise PreventUpdate
+
+    if not input_store:
+        raise PreventUpdate
+
+    inc_pt = input_store.get("inc_pt")
+
+    budget = point_budget(len(libs or {}) + len(legends or {}))
+    traces = []
+
+    libs_select = []
+    if libs:
+        if endf_selct:
+            libs_select = [k for k, l in libs.items() if l in endf_selct]
+        else:
+            libs_select = list(libs.keys())
+
+    lib_df, df = fetch_all(
+        (lib_residual_data_query, inc_pt, libs_select) if libs else None,
+        (data_query, input_store, legends.keys()) if legends and switcher else None,
+    )
+
+    if libs:
+        traces += lib_traces(
+            lib_df, libs, libs_select, max_points=budget, x_range=x_range
+        )
+
+    if legends and switcher:
+        traces += exfor_traces(
+            df,
+            legends,
+            x="en_inc",
+            dx="den_inc",
+            max_points=budget,
+            x_range=x_range,
+        )
+
+    patched = update_trace_data(fig_traces, traces)
+    fig_traces["x_range"] = x_range
 
-            if i == 30:
-                i = 1
+    return apply_relayout(relayout, patched), fig_traces
 
-    return fig, df.to_dict("records"), xaxis_type, yaxis_type
 
+clientside_figure_callbacks(pageparam)
+clientside_datasource_callback("exfor_table_" + pageparam)
 
 
 @callback(
-    Output("main_fig_rp", "figure", allow_duplicate=True),
+    Output("exfor_table_rp", "getRowsResponse"),
+    Input("exfor_table_rp", "getRowsRequest"),
     [
-        Input("xaxis_type_rp", "value"),
-        Input("yaxis_type_rp", "value"),
+        State("input_store_rp", "data"),
+        State("entries_store_rp", "data"),
     ],
-    State("main_fig_rp", "figure"),
     prevent_initial_call=True,
 )
-def update_axis_rp(xaxis_type, yaxis_type, fig):
-    ## Switch the axis type
-    fig.get("layout").get("yaxis").update({"type": yaxis_type})
-    fig.get("layout").get("xaxis").update({"type": xaxis_type})
-
-    return fig
+def exfor_table_rows_rp(request, input_store, legends):
+    if not request:
+        raise PreventUpdate
 
+    return get_rows(request, input_store, legends)
 
 
 @callback(
@@ -524,69 +556,71 @@ def update_axis_rp(xaxis_type, yaxis_type, fig):
         Output("output_energy_slider_rp", "children"),
     ],
     Input("energy_range_rp", "value"),
-    State("main_fig_rp", "figure"),
+    State("fig_traces_rp", "data"),
     prevent_initial_call=True,
 )
-def fileter_by_en_range_rp(energy_range, fig):
+def fileter_by_en_range_rp(energy_range, fig_traces):
     range_text = ""
-    fig, filter_model = fileter_by_en_range(energy_range, fig)
+    patched, filter_model = fileter_by_en_range(energy_range, fig_traces)
     if filter_model:
         range_text = f"{filter_model['e_inc_min']['filter']:.2e} - {filter_model['e_inc_max']['filter']:.2e} MeV"
-    return fig, filter_model, range_text
+    return patched, filter_model, range_text
 
 
 
 @callback(
     [
         Output("main_fig_rp", "figure", allow_duplicate=True),
-        Output("index_table_rp", "filterModel", allow_duplicate=True),
+        Output("fig_traces_rp", "data", allow_duplicate=True),
     ],
-    Input("year_range_rp", "value"),
-    State("main_fig_rp", "figure"),
-    prevent_initial_call=True,
-)
-def fileter_by_year_range_rp(year_range, fig):
-    return filter_by_year_range(year_range, fig)
-
-
-@callback(
-    Output("main_fig_rp", "figure", allow_duplicate=True),
-    Input("index_table_rp", "selectedRows"),
-    State("main_fig_rp", "figure"),
-    prevent_initial_call=True,
-)
-def highlight_data_rp(selected, fig):
-    return highlight_data(selected, fig)
-
-
-@callback(
-    Output("main_fig_rp", "figure", allow_duplicate=True),
     Input("index_table_rp", "cellValueChanged"),
-    State("main_fig_rp", "figure"),
+    [
+        State("fig_traces_rp", "data"),
+        State("input_store_rp", "data"),
+        State("entries_store_rp", "data"),
+        State("libs_store_rp", "data"),
+        State("reduce_data_switch_rp", "value"),
+    ],
     prevent_initial_call=True,
 )
-def scale_data_rp(selected, fig):
-    return scale_data(selected, fig)
+def scale_data_rp(selected, fig_traces, input_store, legends, libs, switcher):
+    if not selected or not fig_traces or not legends:
+        raise PreventUpdate
 
+    ## the dataset as it is shown in the figure, from the cached query
+    entry_id = selected["data"]["entry_id"]
+    df = data_query(input_store, legends.keys())
+    budget = point_budget(len(libs or {}) + len(legends or {}))
+    traces = exfor_traces(
+        df,
+        {entry_id: legends[entry_id]},
+        x="en_inc",
+        dx="den_inc",
+        max_points=budget if switcher else None,
+        x_range=fig_traces.get("x_range") if switcher else None,
+    )
+
+    return scale_data(selected, fig_traces, traces[0])
 
 
 @callback(
     [
         Output("main_fig_rp", "figure", allow_duplicate=True),
+        Output("fig_traces_rp", "data", allow_duplicate=True),
         Output("index_table_rp", "rowTransaction"),
     ],
     Input("del_btn_rp", "n_clicks"),
     [
-        State("main_fig_rp", "figure"),
+        State("fig_traces_rp", "data"),
         State("index_table_rp", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def del_rows_rp(n1, fig, selected):
+def del_rows_rp(n1, fig_traces, selected):
     if n1:
         if selected is None:
             return no_update
-        return del_rows_fig(selected, fig)
+        return del_rows_fig(selected, fig_traces)
 
 
 
@@ -619,30 +653,31 @@ def export_index_rp(n1, n2, input_store):
 
 
 @callback(
-    [
-        Output("exfor_table_rp", "exportDataAsCsv"),
-        Output("exfor_table_rp", "csvExportParams"),
-    ],
+    Output("download_exfor_rp", "data"),
     [
         Input("btn_csv_exfor_rp", "n_clicks"),
         Input("btn_csv_exfor_selct_rp", "n_clicks"),
-        Input("input_store_rp", "data"),
+    ],
+    [
+        State("input_store_rp", "data"),
+        State("entries_store_rp", "data"),
+        State("exfor_table_rp", "filterModel"),
+        State("exfor_table_rp", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def export_data_rp(n1, n2, input_store):
-    # return export_data(n_clicks_all, n_clicks_slctd, input_store)
+def export_data_rp(n1, n2, input_store, legends, filter_model, selected):
     if not input_store:
         raise PreventUpdate
 
     if ctx.triggered_id == "btn_csv_exfor_rp":
-        return export_data(False, input_store)
+        return export_rows(False, input_store, legends, filter_model, selected)
 
     elif ctx.triggered_id == "btn_csv_exfor_selct_rp":
-        return export_data(True, input_store)
+        return export_rows(True, input_store, legends, filter_model, selected)
 
     else:
-        return no_update, no_update
+        return no_update
 
 
 
@@ -30,26 +30,29 @@ from pages_common import (
     input_target,
     input_general,
     input_partial,
-    highlight_data,
-    generate_reactions,
+    clientside_reaction_options_callback,
     export_data,
     input_lin_log_switch,
     del_rows_fig,
     get_indexes,
     export_index,
     generate_api_link,
+    merge_bib,
+    trace_index,
+    fig_traces_store,
+    clientside_figure_callbacks,
 )
 from man import table_desc_thermal
 
 # from config import BASE_URL
 from modules.reactions.thermal_table import thermal_data_table_ag
+from modules.reactions.figs import trace_meta
 from submodules.common import (
     generate_exfortables_file_path,
     generate_endftables_file_path,
 )
 from submodules.utilities.reaction import get_mt
-from submodules.reactions.queries import lib_th_data_query
-from submodules.exfor.queries import data_query
+from modules.queries import lib_th_data_query, data_query
 from submodules.utilities.util import get_number_from_string
 
 
@@ -182,7 +185,6 @@ download_opts = html.Div(
 
 ## Layout of right panel
 right_layout_lib = [
-    libs_navbar,
     html.Hr(
         style={
             "border": "3px",
@@ -201,6 +203,7 @@ right_layout_lib = [
     table_desc_thermal,
     dcc.Store(id="entries_store_th"),
     dcc.Store(id="libs_store_th"),
+    fig_traces_store(pageparam),
     html.Hr(style={"border": "3px", "border-top": "1px solid"}),
     # create_tabs(pageparam),
     footer,
@@ -245,7 +248,7 @@ def layout(**query_strings):
                     dbc.Col(
                         [
                             html.Div(
-                                children=right_layout_lib,
+                                children=[libs_navbar()] + right_layout_lib,
                                 style={"margin-right": "20px", "margin-left": "10px"},
                             ),
                         ],
@@ -294,18 +297,7 @@ def redirect_to_subpages_th(type):
         raise PreventUpdate
 
 
-@callback(
-    Output("reaction_th", "options"),
-    Input("incident_particle_th", "value"),
-)
-def update_reaction_list_th(proj):
-    # print("update_reaction_list")
-
-    if not proj:
-        raise PreventUpdate
-
-    else:
-        return generate_reactions(proj)
+clientside_reaction_options_callback(pageparam)
 
 
 @callback(
@@ -401,6 +393,7 @@ def initial_data_th(input_store):
 @callback(
     [
         Output("main_fig_th", "figure", allow_duplicate=True),
+        Output("fig_traces_th", "data"),
         Output("thermal_stats", "children"),
         Output("thermal_data_table", "rowData"),
         Output("xaxis_type_th", "value"),
@@ -483,9 +476,7 @@ def create_fig_th(input_store, legends, libs, r_click):
         # return no_update, thermal_stat_content, no_update, no_update, no_update
 
     else:
-        df["bib"] = df["entry_id"].map(legends)
-        df = pd.concat([df, df["bib"].apply(pd.Series)], axis=1)
-        df = df.drop(columns=["bib"])
+        df = merge_bib(df, legends)
         df = df.sort_values(
             by=["sf9", "sf8", "year"], ascending=False, na_position="first"
         )
@@ -577,6 +568,7 @@ def create_fig_th(input_store, legends, libs, r_click):
                     error_y=dict(type="data", array=[ row["ddata"] ]),
                     showlegend=True,
                     name=f"{row['author']}, {row['year']} [{row['entry_id']}]",
+                    meta=trace_meta(legends, row["entry_id"]),
                     marker=dict(
                         size=8,
                         symbol=i,
@@ -592,40 +584,41 @@ def create_fig_th(input_store, legends, libs, r_click):
     if libs:
         lib_df = lib_th_data_query( libs.keys() )
 
-    return fig, thermal_stat_content, df.to_dict("records"), xaxis_type, yaxis_type
+    return (
+        fig,
+        trace_index(fig),
+        thermal_stat_content,
+        df.to_dict("records"),
+        xaxis_type,
+        yaxis_type,
+    )
 
 
 
 
-@callback(
-    Output("main_fig_th", "figure", allow_duplicate=True),
-    Input("thermal_data_table", "selectedRows"),
-    State("main_fig_th", "figure"),
-    prevent_initial_call=True,
+clientside_figure_callbacks(
+    pageparam, table_id="thermal_data_table", axis=False, year_range=False
 )
-def highlight_data_th(selected, fig):
-    return highlight_data(selected, fig)
-
-
 
 
 @callback(
     [
         Output("main_fig_th", "figure", allow_duplicate=True),
+        Output("fig_traces_th", "data", allow_duplicate=True),
         Output("thermal_data_table", "rowTransaction"),
     ],
     Input("del_btn_th", "n_clicks"),
     [
-        State("main_fig_th", "figure"),
+        State("fig_traces_th", "data"),
         State("thermal_data_table", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def del_rows_th(n1, fig, selected):
+def del_rows_th(n1, fig_traces, selected):
     if n1:
         if selected is None:
-            return no_update, no_update
-        return del_rows_fig(selected, fig)
+            return no_update, no_update, no_update
+        return del_rows_fig(selected, fig_traces)
 
 
 
@@ -12,7 +12,6 @@ import numpy as np
 import dash
 from dash import Dash, html, dcc, Input, Output, State, ctx, no_update, callback
 import dash_bootstrap_components as dbc
-import plotly.graph_objects as go
 from dash.exceptions import PreventUpdate
 
 
@@ -22,16 +21,14 @@ from pages_common import (
     libs_navbar,
     page_urls,
     lib_page_urls,
-    URL_PATH,
     main_fig,
     input_check,
     input_obs,
     input_target,
     input_general,
     input_partial,
-    generate_reactions,
+    clientside_reaction_options_callback,
     remove_query_parameter,
-    limit_number_of_datapoints,
     exfor_filter_opt,
     libs_filter_opt,
     input_lin_log_switch,
@@ -40,26 +37,39 @@ from pages_common import (
     get_indexes,
     scale_data,
     del_rows_fig,
-    highlight_data,
-    filter_by_year_range,
     fileter_by_en_range,
     export_index,
-    export_data,
     list_link_of_files,
     generate_api_link,
+    relayout_x_range,
+    apply_relayout,
+    trace_index,
+    clientside_figure_callbacks,
+    datasource_store,
+    clientside_datasource_callback,
+    exfor_table_view,
+    get_rows,
+    export_rows,
+    fig_progress,
+    background_callback,
 )
 
 # from config import BASE_URL
-from modules.reactions.list import color_libs
 from modules.reactions.tabs import create_tabs
-from modules.reactions.figs import default_chart, default_axis
+from modules.reactions.figs import (
+    default_chart,
+    default_axis,
+    lib_traces,
+    exfor_traces,
+    update_trace_data,
+)
+from modules.reactions.downsample import point_budget
 from submodules.common import (
     generate_exfortables_file_path,
     generate_endftables_file_path,
 )
 from submodules.utilities.reaction import get_mt
-from submodules.reactions.queries import lib_xs_data_query
-from submodules.exfor.queries import data_query
+from modules.queries import lib_xs_data_query, data_query, fetch_all
 from submodules.utilities.util import get_number_from_string
 
 
@@ -96,7 +106,6 @@ def input_lib(**query_strings):
 
 ## Layout of right panel
 right_layout_lib = [
-    libs_navbar,
     html.Hr(
         style={
             "border": "3px",
@@ -109,6 +118,7 @@ right_layout_lib = [
     # Log/Linear switch
     html.Div(children=input_lin_log_switch(pageparam)),
     # main_fig,
+    fig_progress(pageparam),
     dcc.Loading(
         children=main_fig(pageparam),
         type="circle",
@@ -117,6 +127,7 @@ right_layout_lib = [
     dcc.Store(id="libs_store"),
     html.Hr(style={"border": "3px", "border-top": "1px solid"}),
     create_tabs(pageparam),
+    datasource_store("exfor_table_" + pageparam),
     footer,
 ]
 
@@ -159,7 +170,7 @@ def layout(**query_strings):
                     dbc.Col(
                         [
                             html.Div(
-                                children=right_layout_lib,
+                                children=[libs_navbar()] + right_layout_lib,
                                 style={"margin-right": "20px", "margin-left": "10px"},
                             ),
                         ],
@@ -209,18 +220,7 @@ def redirect_to_subpages(type):
         raise PreventUpdate
 
 
-@callback(
-    Output("reaction_xs", "options"),
-    Input("incident_particle_xs", "value"),
-)
-def update_reaction_list(proj):
-    # print("update_reaction_list")
-
-    if not proj:
-        raise PreventUpdate
-
-    else:
-        return generate_reactions(proj)
+clientside_reaction_options_callback(pageparam)
 
 
 @callback(
@@ -359,10 +359,11 @@ def initial_data_xs(input_store, r_click):
         raise PreventUpdate
 
 
-@callback(
+@background_callback(
     [
         Output("main_fig_xs", "figure", allow_duplicate=True),
-        Output("exfor_table_xs", "rowData"),
+        Output("fig_traces_xs", "data"),
+        Output("exfor_table_xs_source", "data"),
         Output("xaxis_type_xs", "value"),
         Output("yaxis_type_xs", "value"),
     ],
@@ -373,9 +374,16 @@ def initial_data_xs(input_store, r_click):
         Input("endf_selct_xs", "value"),
         Input("reduce_data_switch_xs", "value"),
     ],
+    pageparam=pageparam,
+    cancel=[
+        Input("target_elem_xs", "value"),
+        Input("target_mass_xs", "value"),
+        Input("reaction_xs", "value"),
+        Input("reac_branch_xs", "value"),
+    ],
     prevent_initial_call=True,
 )
-def create_fig(input_store, legends, libs, endf_selct, switcher):
+def create_fig(set_progress, input_store, legends, libs, endf_selct, switcher):
     # print("create_fig")
     if input_store:
         reaction = input_store.get("reaction")
@@ -392,124 +400,133 @@ def create_fig(input_store, legends, libs, endf_selct, switcher):
 
     fig = default_chart(xaxis_type, yaxis_type, reaction)
 
-    lib_df = pd.DataFrame()
+    ## points per trace, the same for every trace of the figure
+    budget = point_budget(len(libs or {}) + len(legends or {}))
+
+    libs_select = []
     if libs:
         if endf_selct:
             libs_select = [k for k, l in libs.items() if l in endf_selct]
         else:
-            libs_select = libs.keys()
-
-        lib_df = lib_xs_data_query(libs_select)
-
-        for l in libs_select:
-            line_color = color_libs(libs[l])
-            new_col = next(line_color)
-
-            fig.add_trace(
-                go.Scatter(
-                    x=lib_df[lib_df["reaction_id"] == int(l)]["en_inc"].astype(float),
-                    y=lib_df[lib_df["reaction_id"] == int(l)]["data"].astype(float),
-                    showlegend=True,
-                    line_color=new_col,
-                    name=str(libs[l]),
-                    mode="lines",
-                )
-            )
+            libs_select = list(libs.keys())
+
+    ## ENDFTABLES and EXFOR are queried at the same time
+    lib_df, df = fetch_all(
+        (lib_xs_data_query, libs_select) if libs else None,
+        (exfor_table_view, input_store, legends) if legends else None,
+    )
+    set_progress(50)
+
+    if libs:
+        fig.add_traces(lib_traces(lib_df, libs, libs_select, max_points=budget))
+
+    set_progress(70)
 
-    df = pd.DataFrame()
     if legends:
-        df = data_query(input_store, legends.keys())
-
-        df["bib"] = df["entry_id"].map(legends)
-        df = pd.concat([df, df["bib"].apply(pd.Series)], axis=1)
-        df = df.drop(columns=["bib"])
-
-        df["entry_id_link"] = (
-            "["
-            + df["entry_id"]
-            + "]("
-            + URL_PATH
-            + "exfor/entry/"
-            + df["entry_id"]
-            + ")"
+        fig.add_traces(
+            exfor_traces(
+                df,
+                legends,
+                x="en_inc",
+                dx="den_inc",
+                max_points=budget if switcher else None,
+                scattergl=legends["total_points"] > 500 and not switcher,
+            )
+        )
+
+    set_progress(100)
+
+    return (
+        fig,
+        trace_index(fig),
+        {"rows": len(df) if legends else 0},
+        xaxis_type,
+        yaxis_type,
+    )
+
+
+@callback(
+    [
+        Output("main_fig_xs", "figure", allow_duplicate=True),
+        Output("fig_traces_xs", "data", allow_duplicate=True),
+    ],
+    Input("main_fig_xs", "relayoutData"),
+    [
+        State("fig_traces_xs", "data"),
+        State("xaxis_type_xs", "value"),
+        State("input_store_xs", "data"),
+        State("entries_store", "data"),
+        State("libs_store", "data"),
+        State("endf_selct_xs", "value"),
+        State("reduce_data_switch_xs", "value"),
+    ],
+    prevent_initial_call=True,
+)
+def zoom_fig_xs(
+    relayout, fig_traces, xaxis_type, input_store, legends, libs, endf_selct, switcher
+):
+    ## reload the points of the visible energy window at full budget
+    x_range = relayout_x_range(relayout, xaxis_type)
+    if x_range is False or not fig_traces:
+        raise PreventUpdate
+
+    if not input_store:
+        raise PreventUpdate
+
+    budget = point_budget(len(libs or {}) + len(legends or {}))
+    traces = []
+
+    libs_select = []
+    if libs:
+        if endf_selct:
+            libs_select = [k for k, l in libs.items() if l in endf_selct]
+        else:
+            libs_select = list(libs.keys())
+
+    lib_df, df = fetch_all(
+        (lib_xs_data_query, libs_select) if libs else None,
+        (data_query, input_store, legends.keys()) if legends and switcher else None,
+    )
+
+    if libs:
+        traces += lib_traces(
+            lib_df, libs, libs_select, max_points=budget, x_range=x_range
+        )
+
+    if legends and switcher:
+        traces += exfor_traces(
+            df,
+            legends,
+            x="en_inc",
+            dx="den_inc",
+            max_points=budget,
+            x_range=x_range,
         )
 
-        i = 0
-        for e in list(legends.keys()):
-            if e == "total_points":
-                continue
-
-            if switcher:
-                df2 = limit_number_of_datapoints(
-                    legends[e]["points"], df[df["entry_id"] == e]
-                )
-
-            else:
-                df2 = df[df["entry_id"] == e]
-
-            if legends["total_points"] > 500 and not switcher:
-                fig.add_trace(
-                    go.Scattergl(
-                        x=df2["en_inc"],
-                        y=df2["data"],
-                        error_x=dict(type="data", array=df2["den_inc"]),
-                        error_y=dict(type="data", array=df2["ddata"]),
-                        showlegend=True,
-                        name=f"{legends[e]['author']}, {legends[e]['year']} [{e}]"
-                        if legends.get(e)
-                        and legends[e].get("author")
-                        and legends[e].get("year")
-                        else f"{legends[e]['author']}, 1900 [{e}]"
-                        if legends.get(e)
-                        else e,
-                        marker=dict(size=8, symbol=i),
-                        mode="markers",
-                    )
-                )
-
-            else:
-                fig.add_trace(
-                    # go.Scattergl(
-                    go.Scatter(
-                        x=df2["en_inc"],
-                        y=df2["data"],
-                        error_x=dict(type="data", array=df2["den_inc"]),
-                        error_y=dict(type="data", array=df2["ddata"]),
-                        showlegend=True,
-                        name=f"{legends[e]['author']}, {legends[e]['year']} [{e}]"
-                        if legends.get(e)
-                        and legends[e].get("author")
-                        and legends[e].get("year")
-                        else f"{legends[e]['author']}, 1900 [{e}]"
-                        if legends.get(e)
-                        else e,
-                        marker=dict(size=8, symbol=i),
-                        mode="markers",
-                    )
-                )
-            i += 1
-
-            if i > 30:
-                i = 1
-
-    return fig, df.to_dict("records"), xaxis_type, yaxis_type
+    patched = update_trace_data(fig_traces, traces)
+    fig_traces["x_range"] = x_range
+
+    return apply_relayout(relayout, patched), fig_traces
+
+
+clientside_figure_callbacks(pageparam)
+clientside_datasource_callback("exfor_table_" + pageparam)
 
 
 @callback(
-    Output("main_fig_xs", "figure", allow_duplicate=True),
+    Output("exfor_table_xs", "getRowsResponse"),
+    Input("exfor_table_xs", "getRowsRequest"),
     [
-        Input("xaxis_type_xs", "value"),
-        Input("yaxis_type_xs", "value"),
+        State("input_store_xs", "data"),
+        State("entries_store", "data"),
     ],
-    State("main_fig_xs", "figure"),
     prevent_initial_call=True,
 )
-def update_axis(xaxis_type, yaxis_type, fig):
-    # if xaxis_type and yaxis_type and fig:
-    fig.get("layout").get("yaxis").update({"type": yaxis_type})
-    fig.get("layout").get("xaxis").update({"type": xaxis_type})
+def exfor_table_rows_xs(request, input_store, legends):
+    if not request:
+        raise PreventUpdate
 
-    return fig
+    return get_rows(request, input_store, legends)
 
 
 @callback(
@@ -519,67 +536,70 @@ def update_axis(xaxis_type, yaxis_type, fig):
         Output("output_energy_slider_xs", "children"),
     ],
     Input("energy_range_xs", "value"),
-    State("main_fig_xs", "figure"),
+    State("fig_traces_xs", "data"),
     prevent_initial_call=True,
 )
-def fileter_by_en_range_xs(energy_range, fig):
+def fileter_by_en_range_xs(energy_range, fig_traces):
     range_text = f"1.00e-8 - 1.00e+3 MeV"
-    fig, filter_model = fileter_by_en_range(energy_range, fig)
+    patched, filter_model = fileter_by_en_range(energy_range, fig_traces)
     if filter_model:
         range_text = f"{filter_model['e_inc_min']['filter']:.2e} - {filter_model['e_inc_max']['filter']:.2e} MeV"
-    return fig, filter_model, range_text
+    return patched, filter_model, range_text
 
 
 @callback(
     [
         Output("main_fig_xs", "figure", allow_duplicate=True),
-        Output("index_table_xs", "filterModel", allow_duplicate=True),
+        Output("fig_traces_xs", "data", allow_duplicate=True),
+    ],
+    Input("index_table_xs", "cellValueChanged"),
+    [
+        State("fig_traces_xs", "data"),
+        State("input_store_xs", "data"),
+        State("entries_store", "data"),
+        State("libs_store", "data"),
+        State("reduce_data_switch_xs", "value"),
     ],
-    Input("year_range_xs", "value"),
-    State("main_fig_xs", "figure"),
-    prevent_initial_call=True,
-)
-def fileter_by_year_range_lib(year_range, fig):
-    return filter_by_year_range(year_range, fig)
-
-
-@callback(
-    Output("main_fig_xs", "figure", allow_duplicate=True),
-    Input("index_table_xs", "selectedRows"),
-    State("main_fig_xs", "figure"),
     prevent_initial_call=True,
 )
-def highlight_data_xs(selected, fig):
-    return highlight_data(selected, fig)
+def scale_data_xs(selected, fig_traces, input_store, legends, libs, switcher):
+    if not selected or not fig_traces or not legends:
+        raise PreventUpdate
 
+    ## the dataset as it is shown in the figure, from the cached query
+    entry_id = selected["data"]["entry_id"]
+    df = data_query(input_store, legends.keys())
+    budget = point_budget(len(libs or {}) + len(legends or {}))
+    traces = exfor_traces(
+        df,
+        {entry_id: legends[entry_id]},
+        x="en_inc",
+        dx="den_inc",
+        max_points=budget if switcher else None,
+        x_range=fig_traces.get("x_range") if switcher else None,
+    )
 
-@callback(
-    Output("main_fig_xs", "figure", allow_duplicate=True),
-    Input("index_table_xs", "cellValueChanged"),
-    State("main_fig_xs", "figure"),
-    prevent_initial_call=True,
-)
-def scale_data_xs(selected, fig):
-    return scale_data(selected, fig)
+    return scale_data(selected, fig_traces, traces[0])
 
 
 @callback(
     [
         Output("main_fig_xs", "figure", allow_duplicate=True),
+        Output("fig_traces_xs", "data", allow_duplicate=True),
         Output("index_table_xs", "rowTransaction"),
     ],
     Input("del_btn_xs", "n_clicks"),
     [
-        State("main_fig_xs", "figure"),
+        State("fig_traces_xs", "data"),
         State("index_table_xs", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def del_rows(n1, fig, selected):
+def del_rows(n1, fig_traces, selected):
     if n1:
         if selected is None:
-            return no_update, no_update
-        return del_rows_fig(selected, fig)
+            return no_update, no_update, no_update
+        return del_rows_fig(selected, fig_traces)
 
 
 @callback(
@@ -632,30 +652,31 @@ def selected(n, col_state, selected):
 
 
 @callback(
-    [
-        Output("exfor_table_xs", "exportDataAsCsv"),
-        Output("exfor_table_xs", "csvExportParams"),
-    ],
+    Output("download_exfor_xs", "data"),
     [
         Input("btn_csv_exfor_xs", "n_clicks"),
         Input("btn_csv_exfor_selct_xs", "n_clicks"),
-        Input("input_store_xs", "data"),
+    ],
+    [
+        State("input_store_xs", "data"),
+        State("entries_store", "data"),
+        State("exfor_table_xs", "filterModel"),
+        State("exfor_table_xs", "selectedRows"),
     ],
     prevent_initial_call=True,
 )
-def export_data_xs(n1, n2, input_store):
-    # return export_data(n_clicks_all, n_clicks_slctd, input_store)
+def export_data_xs(n1, n2, input_store, legends, filter_model, selected):
     if not input_store:
         raise PreventUpdate
 
     if ctx.triggered_id == "btn_csv_exfor_xs":
-        return export_data(False, input_store)
+        return export_rows(False, input_store, legends, filter_model, selected)
 
     elif ctx.triggered_id == "btn_csv_exfor_selct_xs":
-        return export_data(True, input_store)
+        return export_rows(True, input_store, legends, filter_model, selected)
 
     else:
-        return no_update, no_update
+        return no_update
 
 
 @callback(
@@ -13,12 +13,16 @@
 
 
 import os
-import re
+import logging
+import operator
+from functools import reduce, wraps, lru_cache
+import numpy as np
 import pandas as pd
 import urllib.parse
 import dash
 import dash_bootstrap_components as dbc
-from dash import  html, dcc, Input, Output, ctx, no_update, callback
+from dash import  html, dcc, Input, Output, State, ctx, no_update, callback, Patch
+from dash import clientside_callback, ClientsideFunction, DiskcacheManager
 import dash_daq as daq
 from dash.exceptions import PreventUpdate
 from datetime import date
@@ -26,17 +30,47 @@ from datetime import date
 from config import DATA_DIR, API_BASE_URL
 from man import manual
 
-from modules.exfor.list import MAPPING, bib_df, number_of_entries, get_latest_master_release
+from modules.exfor.list import (
+    MAPPING,
+    get_entry_numbers,
+    number_of_entries,
+)
+from modules.exfor.release import get_latest_master_release
 from submodules.common import LIB_LIST_MAX
 from submodules.utilities.elem import ELEMS, elemtoz_nz, ztoelem
 from submodules.utilities.mass import mass_range
 from submodules.utilities.util import get_number_from_string, get_str_from_string
 from submodules.utilities.reaction import reaction_list, exfor_reaction_list
-from submodules.reactions.queries import lib_query
-from submodules.exfor.queries import index_query, get_entry_bib
+from modules.queries import (
+    lib_query,
+    index_query,
+    get_entry_bib,
+    data_query,
+    memoize,
+    fetch_all,
+)
 
 current_year = date.today().year
 
+logger = logging.getLogger(__name__)
+
+
+## Heavy figure builds run as background callbacks. The manager runs them in
+## a separate process and the browser polls for the result, so a target with
+## many datasets does not hold a request worker. When a callback is triggered
+## again, Dash terminates the job still running for the previous input.
+BACKGROUND_CACHE_DIR = os.path.join(DATA_DIR, "callback_cache")
+BACKGROUND_EXPIRE = 600  # seconds
+
+try:
+    import diskcache
+
+    background_manager = DiskcacheManager(
+        diskcache.Cache(BACKGROUND_CACHE_DIR), expire=BACKGROUND_EXPIRE
+    )
+except ImportError:
+    background_manager = None
+
 
 # ------------------------------------------------------------------------------
 # Incident particles
@@ -188,133 +222,137 @@ navbar = html.Div(
 )
 
 
-libs_navbar = html.Div(
-    [
-        html.H5(
-            html.A(
-                html.B("IAEA Nuclear Reaction Data Explorer"),
-                href="https://nds.iaea.org/dataexplorer/",
-            )
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    html.Div(
-                        [
-                            html.A(
-                                [
-                                    html.Img(
-                                        src=dash.get_asset_url("logo.png"),
-                                        height="20px",
-                                    ),
-                                ],
-                                href=URL_PATH,
-                            ),
-                            " ",
-                            html.A(
-                                "Nuclear Reactions",
-                                href=f"{URL_PATH}reactions",
-                                className="text-dark",
-                            ),
-                        ],
+def libs_navbar():
+    ## built per page load so that a new EXFOR master release shows up
+    return html.Div(
+        [
+            html.H5(
+                html.A(
+                    html.B("IAEA Nuclear Reaction Data Explorer"),
+                    href="https://nds.iaea.org/dataexplorer/",
+                )
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.A(
+                                    [
+                                        html.Img(
+                                            src=dash.get_asset_url("logo.png"),
+                                            height="20px",
+                                        ),
+                                    ],
+                                    href=URL_PATH,
+                                ),
+                                " ",
+                                html.A(
+                                    "Nuclear Reactions",
+                                    href=f"{URL_PATH}reactions",
+                                    className="text-dark",
+                                ),
+                            ],
+                        ),
+                        width=2,
+                        style={"font-size": "medium"},
                     ),
-                    width=2,
-                    style={"font-size": "medium"},
-                ),
-                dbc.Col(
-                    html.Div(
-                        [
-                            "Built with ",
-                            html.A(
-                                "ENDFTABLES (2021)",
-                                href="https://nds.iaea.org/talys/",
-                                # className="text-dark",
-                            ),
-                            " and ",
-                            html.A(
-                                "EXFORTABLES_py (EXFORTABLE-Inspired Nuclear Reaction Database)",
-                                href="https://github.com/IAEA-NDS/exfortables_py",
-                                # className="text-dark",
-                            ),
-                            " by ",
-                            html.A(
-                                "EXFOR_Parser",
-                                href="https://github.com/IAEA-NDS/exforparser",
-                                # className="text-dark",
-                            ),
-                            f" using EXFOR master file: {get_latest_master_release()}. ",
-                            f"The previous version is available ",
-                            html.A(
-                                "here",
-                                href="https://nds.iaea.org/dataexplorer-2022/",
-                                # className="text-dark",
-                            ),
-                            f"."
-                        ],
-                        style={
-                            "font-size": "smaller",
-                            "color": "gray",
-                            "text-align": "left",
-                        },
+                    dbc.Col(
+                        html.Div(
+                            [
+                                "Built with ",
+                                html.A(
+                                    "ENDFTABLES (2021)",
+                                    href="https://nds.iaea.org/talys/",
+                                    # className="text-dark",
+                                ),
+                                " and ",
+                                html.A(
+                                    "EXFORTABLES_py (EXFORTABLE-Inspired Nuclear Reaction Database)",
+                                    href="https://github.com/IAEA-NDS/exfortables_py",
+                                    # className="text-dark",
+                                ),
+                                " by ",
+                                html.A(
+                                    "EXFOR_Parser",
+                                    href="https://github.com/IAEA-NDS/exforparser",
+                                    # className="text-dark",
+                                ),
+                                f" using EXFOR master file: {get_latest_master_release()}. ",
+                                f"The previous version is available ",
+                                html.A(
+                                    "here",
+                                    href="https://nds.iaea.org/dataexplorer-2022/",
+                                    # className="text-dark",
+                                ),
+                                f"."
+                            ],
+                            style={
+                                "font-size": "smaller",
+                                "color": "gray",
+                                "text-align": "left",
+                            },
+                        ),
                     ),
-                ),
-            ]
-        ),
-    ]
-)
+                ]
+            ),
+        ]
+    )
 
 
-exfor_navbar = html.Div(
-    [
-        html.H5(
-            html.A(
-                html.B("IAEA Nuclear Reaction Data Explorer"),
-                href="https://nds.iaea.org/dataexplorer/",
-            )
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    html.Div(
+def exfor_navbar():
+    ## built per page load since the entry count needs the EXFOR bib table
+    return html.Div(
+        [
+            html.H5(
+                html.A(
+                    html.B("IAEA Nuclear Reaction Data Explorer"),
+                    href="https://nds.iaea.org/dataexplorer/",
+                )
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        html.Div(
+                            [
+                                html.A(
+                                    [
+                                        html.Img(
+                                            src=dash.get_asset_url("logo.png"),
+                                            height="20px",
+                                        ),
+                                    ],
+                                    href=URL_PATH,
+                                ),
+                                " ",
+                                html.A(
+                                    "EXFOR Viewer",
+                                    href=f"{URL_PATH}exfor",
+                                    className="text-dark",
+                                ),
+                            ],
+                        ),
+                        width=2,
+                        style={"font-size": "small"},
+                    ),
+                    dbc.Col(
                         [
-                            html.A(
-                                [
-                                    html.Img(
-                                        src=dash.get_asset_url("logo.png"),
-                                        height="20px",
-                                    ),
-                                ],
-                                href=URL_PATH,
-                            ),
-                            " ",
-                            html.A(
-                                "EXFOR Viewer",
-                                href=f"{URL_PATH}exfor",
-                                className="text-dark",
-                            ),
+                            # html.Div([
+                            "Experimental Nuclear Reaction Experimental Data (EXFOR) is compiled by the ",
+                            html.A("International Network of Nuclear Reaction Data Centres (NRDC) ", 
+                                   href="https://nds.iaea.org/nrdc"),
+                            "under the auspices of the International Atomic Energy Agency. ",
+                            html.Br(),
+                            f"Number of entry: {number_of_entries()}. ",
+                            f"Last update EXFOR master repository: {get_latest_master_release()}.",
+                            # ]),
                         ],
+                        style={"font-size": "smaller"},
                     ),
-                    width=2,
-                    style={"font-size": "small"},
-                ),
-                dbc.Col(
-                    [
-                        # html.Div([
-                        "Experimental Nuclear Reaction Experimental Data (EXFOR) is compiled by the ",
-                        html.A("International Network of Nuclear Reaction Data Centres (NRDC) ", 
-                               href="https://nds.iaea.org/nrdc"),
-                        "under the auspices of the International Atomic Energy Agency. ",
-                        html.Br(),
-                        f"Number of entry: {number_of_entries}. ",
-                        f"Last update EXFOR master repository: {get_latest_master_release()}.",
-                        # ]),
-                    ],
-                    style={"font-size": "smaller"},
-                ),
-            ]
-        ),
-    ]
-)
+                ]
+            ),
+        ]
+    )
 
 
 footer = html.Div(
@@ -353,23 +391,80 @@ footer = html.Div(
 
 
 def main_fig(pageparam):
-    return dcc.Graph(
-        id="main_fig_" + pageparam,
-        config={
-            "displayModeBar": True,
-            "scrollZoom": True,
-            "modeBarButtonsToAdd": ["drawline", "drawopenpath", "eraseshape"],
-            "modeBarButtonsToRemove": ["lasso2d"],
-        },
-        figure={
-            "layout": {
-                "title": "Please select target and reaction.",
-                "height": 600,
-            }
-        },
+    return html.Div(
+        [
+            dcc.Graph(
+                id="main_fig_" + pageparam,
+                config={
+                    "displayModeBar": True,
+                    "scrollZoom": True,
+                    "modeBarButtonsToAdd": ["drawline", "drawopenpath", "eraseshape"],
+                    "modeBarButtonsToRemove": ["lasso2d"],
+                },
+                figure={
+                    "layout": {
+                        "title": "Please select target and reaction.",
+                        "height": 600,
+                    }
+                },
+            ),
+            fig_traces_store(pageparam),
+        ]
+    )
+
+
+def fig_progress(pageparam):
+    ## progress of the background figure build, outside of dcc.Loading
+    return dbc.Progress(
+        id="fig_progress_" + pageparam,
+        value=0,
+        striped=True,
+        animated=True,
+        style={"height": "4px", "visibility": "hidden"},
     )
 
 
+def background_callback(*args, pageparam, cancel=None, **kwargs):
+    ## callback() of a figure build. The decorated function takes set_progress
+    ## first, set_progress(percent) moves fig_progress_<pageparam>. Inputs in
+    ## cancel stop the running job as soon as they change.
+    progress_id = "fig_progress_" + pageparam
+
+    if background_manager is None:
+        ## no manager installed: runs in the request worker
+        def decorator(func):
+            @wraps(func)
+            def run(*func_args, **func_kwargs):
+                return func(lambda percent: None, *func_args, **func_kwargs)
+
+            return callback(*args, **kwargs)(run)
+
+        return decorator
+
+    return callback(
+        *args,
+        background=True,
+        manager=background_manager,
+        progress=Output(progress_id, "value"),
+        progress_default=0,
+        running=[
+            (
+                Output(progress_id, "style"),
+                {"height": "4px", "visibility": "visible"},
+                {"height": "4px", "visibility": "hidden"},
+            )
+        ],
+        cancel=cancel,
+        **kwargs,
+    )
+
+
+def fig_traces_store(pageparam):
+    ## What the figure callbacks need to know about the traces of main_fig,
+    ## so that they can send a Patch instead of round-tripping the figure
+    return dcc.Store(id="fig_traces_" + pageparam)
+
+
 def input_obs(pageparam):
     ## limited observables ready for the data view
     return [
@@ -646,7 +741,7 @@ def reduce_data_switch(pageparam):
                             style={"font-size": "smaller", "color": "gray"},
                         ),
                         dbc.Tooltip(
-                            f"Change the number of data points loaded into the figure.\n\nIf there are more than a thousand data points in one dataset, some of the data points are ommited from the plot. By default, every 100 points will be loaded into figure. All data will be loaded if this switch is on.",
+                            f"Change the number of data points loaded into the figure.\n\nIf the datasets are large, a representative subset of the points is plotted, which keeps the peaks and the overall shape of each dataset. Zooming into the figure reloads the points of the visible energy range. All data will be loaded if this switch is off.",
                             target="data-toast-toggle",
                             placement="left",
                             style={
@@ -702,26 +797,207 @@ def excl_mxw_switch(pageparam):
     ]
 
 
-def limit_number_of_datapoints(points, df):
-    if points <= 100:
-        return df
-
-    elif 100 < points <= 1000:
-        nskip = int(points / 100)
+def relayout_x_range(relayout, xaxis_type):
+    ## Visible x window in data units from the relayoutData of a graph.
+    ## Returns None after autorange, False if the x axis was not changed.
+    if not relayout:
+        return False
 
-        return df.iloc[::nskip, :]
+    if relayout.get("xaxis.autorange"):
+        return None
 
-    elif 1000 < points <= 5000:
-        nskip = int(points / 100)
-        return df.iloc[::nskip, :]
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        x_range = [relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]]
 
-    elif points > 5000:
-        nskip = int(points / 100)
-        return df.iloc[::nskip, :]
+    elif "xaxis.range" in relayout:
+        x_range = list(relayout["xaxis.range"])
 
     else:
+        return False
+
+    ## log axes report the range as exponents
+    if xaxis_type == "log":
+        x_range = [10 ** float(r) for r in x_range]
+
+    return sorted(float(r) for r in x_range)
+
+
+def apply_relayout(relayout, patched):
+    ## the figure on the server does not know the zoom done in the browser
+    for axis in ("xaxis", "yaxis"):
+        if relayout.get(axis + ".autorange"):
+            patched["layout"][axis]["autorange"] = True
+
+        elif axis + ".range[0]" in relayout and axis + ".range[1]" in relayout:
+            patched["layout"][axis]["autorange"] = False
+            patched["layout"][axis]["range"] = [
+                relayout[axis + ".range[0]"],
+                relayout[axis + ".range[1]"],
+            ]
+
+        elif axis + ".range" in relayout:
+            patched["layout"][axis]["autorange"] = False
+            patched["layout"][axis]["range"] = relayout[axis + ".range"]
+
+    return patched
+
+
+def merge_bib(df, legends):
+    ## Bibliography columns (author, year, ...) onto the data points.
+    ## One row per entry, joined on entry_id, instead of one pd.Series per point.
+    bib_df = pd.DataFrame.from_dict(
+        {e: b for e, b in legends.items() if isinstance(b, dict)}, orient="index"
+    )
+    bib_df = bib_df[bib_df.columns.difference(df.columns, sort=False)]
+
+    return df.join(bib_df, on="entry_id")
+
+
+def exfor_table_df(input_store, legends):
+    ## rows of the EXFOR data table: data points, bibliography and entry link
+    df = data_query(input_store, legends.keys())
+    df = merge_bib(df, legends)
+    df["entry_id_link"] = (
+        "[" + df["entry_id"] + "](" + URL_PATH + "exfor/entry/" + df["entry_id"] + ")"
+    )
+
+    return df
+
+
+## AG Grid filterModel types, see https://www.ag-grid.com/javascript-data-grid/filtering/
+NUMBER_FILTERS = {
+    "equals": operator.eq,
+    "notEqual": operator.ne,
+    "lessThan": operator.lt,
+    "lessThanOrEqual": operator.le,
+    "greaterThan": operator.gt,
+    "greaterThanOrEqual": operator.ge,
+}
+
+TEXT_FILTERS = {
+    "contains": lambda s, v: s.str.contains(v, regex=False),
+    "notContains": lambda s, v: ~s.str.contains(v, regex=False),
+    "equals": lambda s, v: s == v,
+    "notEqual": lambda s, v: s != v,
+    "startsWith": lambda s, v: s.str.startswith(v),
+    "endsWith": lambda s, v: s.str.endswith(v),
+}
+
+
+def filter_mask(series, model):
+    ## boolean mask of one column of the filterModel
+    if model.get("operator"):
+        conditions = model.get("conditions") or [
+            model.get("condition1"),
+            model.get("condition2"),
+        ]
+        masks = [filter_mask(series, c) for c in conditions if c]
+        combine = operator.and_ if model["operator"] == "AND" else operator.or_
+
+        return reduce(combine, masks)
+
+    type = model.get("type")
+    value = model.get("filter")
+
+    if type in ("blank", "notBlank"):
+        blank = series.isna() | (series.astype(str) == "")
+        return blank if type == "blank" else ~blank
+
+    if model.get("filterType") == "number":
+        series = pd.to_numeric(series, errors="coerce")
+
+        if type == "inRange":
+            return (series > value) & (series < model.get("filterTo"))
+
+        elif type in NUMBER_FILTERS and value is not None:
+            return NUMBER_FILTERS[type](series, value)
+
+    elif model.get("filterType") == "text" and type in TEXT_FILTERS and value:
+        ## authors and entry ids repeat over the points of an entry: the
+        ## text filter runs on the distinct values only, then maps back
+        codes, uniques = pd.factorize(series)
+        uniques = pd.Series(uniques, dtype=object).astype(str).str.lower()
+        hits = TEXT_FILTERS[type](uniques, str(value).lower()).to_numpy()
+        hits = np.append(hits, False)  # code -1, missing value
+
+        return pd.Series(hits[codes], index=series.index)
+
+    return pd.Series(True, index=series.index)
+
+
+def filter_rows(df, filter_model):
+    if not filter_model:
+        return df
+
+    masks = [
+        filter_mask(df[col], model)
+        for col, model in filter_model.items()
+        if col in df.columns
+    ]
+    if not masks:
         return df
 
+    return df[reduce(operator.and_, masks)]
+
+
+def sort_rows(df, sort_model):
+    sort_model = [s for s in sort_model or [] if s.get("colId") in df.columns]
+    if not sort_model:
+        return df
+
+    return df.sort_values(
+        by=[s["colId"] for s in sort_model],
+        ascending=[s.get("sort") != "desc" for s in sort_model],
+        kind="stable",
+    )
+
+
+def exfor_table_rows(input_store, legends, filter_model=None, sort_model=None):
+    df = exfor_table_df(input_store, legends)
+    df = filter_rows(df, filter_model)
+
+    return sort_rows(df, sort_model)
+
+
+## Filtered and sorted tables are kept in the query cache, so scrolling down a
+## large table only slices the cached frame. The frames are shared, read-only.
+## The disk tier carries the view made by the figure job, which runs in a
+## background process, over to the worker that serves get_rows().
+## Pass filter_model and sort_model by keyword: the order of the sortModel
+## columns is part of the key.
+exfor_table_view = memoize(exfor_table_rows, copy=False)
+
+
+def get_rows(request, input_store, legends):
+    ## getRowsResponse of the infinite row model for one block of rows
+    if not input_store or not legends:
+        return {"rowData": [], "rowCount": 0}
+
+    df = exfor_table_view(
+        input_store,
+        legends,
+        filter_model=request.get("filterModel") or None,
+        sort_model=request.get("sortModel") or None,
+    )
+    rows = df.iloc[request.get("startRow", 0) : request.get("endRow", 100)]
+
+    return {"rowData": rows.to_dict("records"), "rowCount": len(df)}
+
+
+def datasource_store(table_id):
+    ## written by create_fig when the query behind table_id has changed
+    return dcc.Store(id=table_id + "_source")
+
+
+def clientside_datasource_callback(table_id):
+    clientside_callback(
+        ClientsideFunction(namespace="tables", function_name="purge_rows"),
+        Output(table_id, "getRowsResponse", allow_duplicate=True),
+        Input(table_id + "_source", "data"),
+        State(table_id, "id"),
+        prevent_initial_call=True,
+    )
+
 
 def remove_query_parameter(url, param):
     # Remove query parameter from querystrings
@@ -732,6 +1008,7 @@ def remove_query_parameter(url, param):
     return url_parts._replace(query=updated_query).geturl()
 
 
+@lru_cache(maxsize=None)
 def generate_reactions(proj=None):
     reactions = reaction_list(proj)
     options = [
@@ -744,6 +1021,7 @@ def generate_reactions(proj=None):
     return options
 
 
+@lru_cache(maxsize=None)
 def generate_exfor_reactions(proj=None):
     ## EXFOR reactions are different from indexing one, i.e. N,N1 does not exist and only N,INL exist
     reactions = exfor_reaction_list(proj)
@@ -757,6 +1035,41 @@ def generate_exfor_reactions(proj=None):
     return options
 
 
+def reaction_options():
+    ## Options of the reaction dropdowns for every incident particle, the same
+    ## for every user. Built once at startup and served as reaction_options.js
+    ## (see app.py), which the browser keeps in its cache.
+    ## Only the particles of the incident_particle radio items of
+    ## input_general(); a particle whose list cannot be made gets none.
+    options = {"reactions": {}, "exfor_reactions": {}}
+
+    for p in PARTICLE:
+        for kind, generate in (
+            ("reactions", generate_reactions),
+            ("exfor_reactions", generate_exfor_reactions),
+        ):
+            try:
+                options[kind][p] = generate(p)
+            except Exception as e:
+                logger.warning("No %s options for incident particle %s: %s", kind, p, e)
+                options[kind][p] = []
+
+    return options
+
+
+def clientside_reaction_options_callback(pageparam, exfor=False):
+    ## the options of reaction_<pageparam> follow the incident particle
+    ## without a callback to the server, see assets/options.js
+    clientside_callback(
+        ClientsideFunction(
+            namespace="options",
+            function_name="exfor_reactions" if exfor else "reactions",
+        ),
+        Output("reaction_" + pageparam, "options"),
+        Input("incident_particle_" + pageparam, "value"),
+    )
+
+
 def input_check(type, elem, mass, reaction):
     if not type or not elem or not mass or not reaction:
         # if any(not i for i in (type, elem, mass, reaction)):
@@ -810,9 +1123,6 @@ def input_check_mass(mass):
     return mass.lower()
 
 
-entries = bib_df["entry"].to_list()
-
-
 def entry_id_check(entry_id):
     if not entry_id:
         raise PreventUpdate
@@ -820,7 +1130,7 @@ def entry_id_check(entry_id):
     elif len(entry_id) != 5 and len(entry_id) != 11:
         raise PreventUpdate
 
-    elif not entry_id.startswith(tuple(entries)):
+    elif not entry_id.startswith(get_entry_numbers()):
         raise PreventUpdate
 
     if len(entry_id) == 5:
@@ -847,8 +1157,7 @@ def get_indexes(input_store):
     libs = {}
 
     if type == "XS" or type == "DA" or type == "FY" or type == "TH":
-        entries = index_query(input_store)
-        libs = lib_query(input_store)
+        entries, libs = fetch_all((index_query, input_store), (lib_query, input_store))
         total_points = sum([e["points"] for e in entries.values()]) if entries else 0
 
         if type == "TH":
@@ -874,8 +1183,7 @@ def get_indexes(input_store):
         rp_elem = input_store.get("rp_elem")
         rp_mass = input_store.get("rp_mass")
 
-        entries = index_query(input_store)
-        libs = lib_query(input_store)
+        entries, libs = fetch_all((index_query, input_store), (lib_query, input_store))
 
         total_points = sum([e["points"] for e in entries.values()]) if entries else 0
         search_result = html.Div(
@@ -925,52 +1233,89 @@ def get_indexes(input_store):
         )
 
 
-def highlight_data(selected, fig):
-    # print("highlight_data")
+def clientside_figure_callbacks(
+    pageparam, axis_ids=None, table_id=None, axis=True, year_range=True
+):
+    ## axis type, year filter and highlighting run in the browser, see assets/figs.js
+    fig_id = "main_fig_" + pageparam
+    table_id = table_id or "index_table_" + pageparam
+    axis_ids = axis_ids or ("xaxis_type_" + pageparam, "yaxis_type_" + pageparam)
+
+    if axis:
+        clientside_callback(
+            ClientsideFunction(namespace="figs", function_name="update_axis"),
+            Output(fig_id, "figure", allow_duplicate=True),
+            [Input(axis_ids[0], "value"), Input(axis_ids[1], "value")],
+            State(fig_id, "figure"),
+            prevent_initial_call=True,
+        )
 
-    if not fig or not selected:
-        raise PreventUpdate
+    if year_range:
+        clientside_callback(
+            ClientsideFunction(namespace="figs", function_name="filter_by_year_range"),
+            [
+                Output(fig_id, "figure", allow_duplicate=True),
+                Output(table_id, "filterModel", allow_duplicate=True),
+            ],
+            Input("year_range_" + pageparam, "value"),
+            State(fig_id, "figure"),
+            prevent_initial_call=True,
+        )
 
-    if selected:
-        for record in fig.get("data"):
-            record.update({"marker": {"size": 8}})
+    clientside_callback(
+        ClientsideFunction(namespace="figs", function_name="highlight_data"),
+        Output(fig_id, "figure", allow_duplicate=True),
+        Input(table_id, "selectedRows"),
+        State(fig_id, "figure"),
+        prevent_initial_call=True,
+    )
 
-            if len(record.get("name").split(",")) > 1:
-                legend = re.split(",|\[|\]", record.get("name"))
 
-            else:
-                continue
+def trace_index(fig, x_range=None):
+    ## meta and scale of every trace, in the order of fig.data
+    traces = [{"name": t.name, "meta": t.meta, "scale": 1.0} for t in fig.data]
 
-            for s in selected:
-                if legend[2].strip() == s["entry_id"]:
-                    record.update({"marker": {"size": 15}})
+    return index_entries({"traces": traces, "x_range": x_range})
 
-                else:
-                    continue
-    return fig
 
+def index_entries(fig_traces):
+    ## entry_id -> positions of its traces in the figure, and the energy bounds
+    ## of the datasets from the index, sorted by their lower end
+    entries = {}
+    bounds = []
+    for i, t in enumerate(fig_traces["traces"]):
+        meta = t["meta"]
+        if not meta:
+            continue
 
-def del_rows_fig(selected, fig):
-    del_data = []
+        entries.setdefault(meta["entry_id"], []).append(i)
 
-    for r in range(len(fig.get("data"))):
-        # print(r, fig["data"][r])
-        if len(fig["data"][r]["name"].split(",")) > 1:
-            legend = re.split(",|\[|\]", fig["data"][r]["name"])
-        else:
-            continue
+        if meta.get("e_min") is not None and meta.get("e_max") is not None:
+            bounds.append([i, meta["e_min"], meta["e_max"]])
 
-        for s in selected:
-            if legend[2].strip() == s["entry_id"]:
-                del_data += [r]
+    fig_traces["entries"] = entries
+    fig_traces["bounds"] = sorted(bounds, key=lambda b: b[1])
 
+    return fig_traces
+
+
+def del_rows_fig(selected, fig_traces):
+    del_data = sorted(
+        i for s in selected for i in fig_traces["entries"].get(s["entry_id"], [])
+    )
+
+    patched = Patch()
     for d in reversed(del_data):
-        del fig["data"][d]
+        del patched["data"][d]
+
+    fig_traces["traces"] = [
+        t for r, t in enumerate(fig_traces["traces"]) if r not in set(del_data)
+    ]
 
-    return fig, {"remove": selected}
+    return patched, index_entries(fig_traces), {"remove": selected}
 
 
-def scale_data(selected, fig):
+def scale_data(selected, fig_traces, trace):
     ## selected looks as follows
     ##  {'rowIndex': 0,
     # 'rowId': '0',
@@ -978,109 +1323,56 @@ def scale_data(selected, fig):
     # 'value': '0.8',
     # 'colId': 'scale',
     # 'timestamp': 1697111382289}
-    if not fig or not selected:
+    ## trace is the selected dataset rebuilt by the page, unscaled
+    if not fig_traces or not selected or trace is None:
         raise PreventUpdate
 
-    if selected:
-        for record in fig.get("data"):
-            # record looks like this:
-            # {'error_x': {'array': [None, None, None, None, None, None, None, None, None, None, None, None, None, None, None], 'type': 'data'}, 'error_y': {'array': [None, None, None, None, None, None, None, None, None, None, None, None, None, None, None], 'type': 'data'}, 'marker': {'size': 8}, 'mode': 'markers', 'name': 'S.M.Sahakundu, 1979 [A0181-005-0]', 'showlegend': True, 'x': [10.5, 11.9, 12, 13.6, 13.8, 15, 16, 16.5, 17.7, 18.1, 20, 21, 22, 23, 27.6], 'y': [0.05, 0.14200000000000002, 0.2, 0.33, 0.34, 0.4, 0.28, 0.27, 0.2, 0.163, 0.105, 0.08600000000000001, 0.081, 0.045, 0.021], 'type': 'scatter'}
-            record.update({"marker": {"size": 8}})
+    scale = float(selected["value"])
 
-            if len(record.get("name").split(",")) > 1:
-                ## 'name': 'S.M.Sahakundu, 1979 [A0181-005-0]'
-                legend = re.split(",|\[|\]", record.get("name"))
+    patched = Patch()
+    for i in fig_traces["entries"].get(selected["data"]["entry_id"], []):
+        ## x too, the rebuilt trace may hold other points after a zoom
+        patched["data"][i]["x"] = trace.x
+        patched["data"][i]["y"] = [y * scale if y is not None else y for y in trace.y]
+        fig_traces["traces"][i]["scale"] = scale
 
-                if legend[2].strip() == selected["data"]["entry_id"]:
-                    record.update(
-                        {"y": [y * float(selected["value"]) for y in record["y"]]}
-                    )
+    return patched, fig_traces
 
-    return fig
 
+def fileter_by_en_range(energy_range, fig_traces):
+    ## Only the index bounds are compared, the points of the traces are not read
+    if not energy_range or not fig_traces:
+        return no_update, no_update
 
-def filter_by_year_range(year_range, fig):
-    if not fig or not year_range:
-        raise PreventUpdate
+    patched = Patch()
+    if not fig_traces["bounds"]:
+        return patched, {}
 
-    if year_range and fig:
-        filter_model = {}
-
-        for record in fig.get("data"):
-            record.update({"visible": "true"})
-
-            if len(record.get("name").split(",")) > 1:
-                legend = re.split(",|\[", record.get("name"))
-                # print(record)
-
-                if year_range:
-                    if not year_range[0] < int(legend[1].strip()) < year_range[1]:
-                        record.update({"visible": "legendonly"})
-
-                    if year_range[0] < int(legend[1].strip()) < year_range[1]:
-                        record.update({"visible": "true"})
-
-                    filter_model = {
-                        "year": {
-                            "filterType": "number",
-                            "type": "greaterThan",
-                            "filter": year_range[0],
-                        },
-                        "year": {
-                            "filterType": "number",
-                            "type": "lessThan",
-                            "filter": year_range[1],
-                        },
-                    }
+    lower, upper = energy_range_conversion(energy_range)
+    pos, e_min, e_max = (np.array(c) for c in zip(*fig_traces["bounds"]))
 
-    return fig, filter_model
-
-
-def fileter_by_en_range(energy_range, fig):
-    # print(json.dumps(fig, indent=1))
-    filter_model = {}
-    if energy_range and fig:
-        for record in fig.get("data"):
-            record.update({"visible": "true"})
-            if len(record.get("name").split(",")) > 1:
-                if energy_range:
-                    ## get the average energy of the dataset
-
-                    sum_x = sum([float(x) for x in record["x"] if x is not None])
-                    min_x = min(record["x"])
-                    max_x = max(record["x"])
-                    lower, upper = energy_range_conversion(energy_range)
-
-                    if lower < min_x and max_x < upper:
-                        record.update({"visible": "true"})
-
-                    elif min_x > upper:
-                        record.update({"visible": "legendonly"})
-
-                    elif max_x < lower:
-                        record.update({"visible": "legendonly"})
-
-                    # elif not lower < sum_x / len(record["x"]) < upper:
-                    #     record.update({"visible": "legendonly"})
-
-                    # elif lower < sum_x / len(record["x"]) < upper:
-                    #     record.update({"visible": "true"})
-
-                    filter_model = {
-                        "e_inc_min": {
-                            "filterType": "number",
-                            "type": "greaterThan",
-                            "filter": lower,
-                        },
-                        "e_inc_max": {
-                            "filterType": "number",
-                            "type": "lessThan",
-                            "filter": upper,
-                        },
-                    }
+    ## datasets starting above the range are at the end of the sorted bounds
+    n = np.searchsorted(e_min, upper, side="right")
+    visible = np.zeros(len(pos), dtype=bool)
+    visible[:n] = e_max[:n] >= lower
+
+    for i, v in zip(pos.tolist(), visible.tolist()):
+        patched["data"][i]["visible"] = "true" if v else "legendonly"
 
-        return fig, filter_model
-    return no_update, no_update
+    filter_model = {
+        "e_inc_min": {
+            "filterType": "number",
+            "type": "greaterThan",
+            "filter": lower,
+        },
+        "e_inc_max": {
+            "filterType": "number",
+            "type": "lessThan",
+            "filter": upper,
+        },
+    }
+
+    return patched, filter_model
 
 
 def energy_range_conversion(energy_range):
@@ -1156,23 +1448,42 @@ def export_data(onlySelected, input_store):
     }
 
     if type.upper() == "SIG":
-        data["columnKeys"].append(["residual", "level_num"])
+        data["columnKeys"] += ["residual", "level_num"]
 
     elif type.upper() == "RP":
-        data["columnKeys"].append(["residual"])
+        data["columnKeys"] += ["residual"]
 
     elif type.upper() == "FY":
-        data["columnKeys"].append(["mass", "charge", "isomer"])
+        data["columnKeys"] += ["mass", "charge", "isomer"]
 
     elif type.upper() == "DA":
-        data["columnKeys"].append(["angle", "dangle"])
+        data["columnKeys"] += ["angle", "dangle"]
 
     elif type.upper() == "DE":
-        data["columnKeys"].append(["energy", "denergy"])
+        data["columnKeys"] += ["energy", "denergy"]
 
     return True, data
 
 
+def export_rows(onlySelected, input_store, legends, filter_model, selected):
+    ## CSV of a server-side data table: the grid only holds the rows it has
+    ## displayed, so the file is written from the cached table instead
+    _, params = export_data(onlySelected, input_store)
+
+    if onlySelected:
+        df = pd.DataFrame(selected or [])
+    elif legends:
+        df = exfor_table_view(input_store, legends, filter_model=filter_model or None)
+    else:
+        df = pd.DataFrame()
+
+    columns = [c for c in params["columnKeys"] if c in df.columns]
+
+    return dcc.send_data_frame(
+        df[columns].to_csv, params["fileName"], index=False
+    )
+
+
 def list_link_of_files(dir, files):
     flinks = []
     for f in sorted(files):
@@ -0,0 +1,41 @@
+####################################################################
+#
+# This file is part of libraries-2023 dataexplorer, https://nds.iaea.org/dataexplorer/.
+# Copyright (C) 2022 International Atomic Energy Agency (IAEA)
+#
+# Contact:    nds.contact-point@iaea.org
+#
+####################################################################
+
+from modules.cache_keys import make_key
+
+
+def cache_key(name, args, kwargs):
+    return make_key(name, "test", args, kwargs)
+
+
+def test_argument_positions_are_kept():
+    assert cache_key("f", (1, 2), {}) != cache_key("f", (2, 1), {})
+    assert cache_key("f", ("a", "b"), {}) != cache_key("f", ("b", "a"), {})
+
+
+def test_id_lists_are_order_insensitive():
+    input_store = {"target_elem": "Fe", "target_mass": "56", "reaction": "n,p"}
+
+    assert cache_key("f", (input_store, ["1234", "5678"]), {}) == cache_key(
+        "f", (input_store, ["5678", "1234"]), {}
+    )
+    assert cache_key("f", (), {"libs": [3, 1, 2]}) == cache_key(
+        "f", (), {"libs": [1, 2, 3]}
+    )
+
+
+def test_input_store_key_order_and_unset_values():
+    a = {"target_elem": "Fe", "reaction": "n,p", "branch": None}
+    b = {"reaction": "n,p", "target_elem": "Fe"}
+
+    assert cache_key("f", (a,), {}) == cache_key("f", (b,), {})
+
+
+def test_data_version_is_part_of_the_key():
+    assert make_key("f", "v1", (1,), {}) != make_key("f", "v2", (1,), {})